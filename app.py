@@ -1,287 +1,1920 @@
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, Response, request, jsonify, render_template, stream_with_context
 from bs4 import BeautifulSoup, SoupStrainer
+from lxml import etree
+import lxml.html
 import requests
 from fake_useragent import UserAgent
 import re
-from concurrent.futures import ThreadPoolExecutor, as_completed
 import threading
+import queue
 import random
 import time
+import bisect
 import json
+import math
 import os
-import json
+import sqlite3
+import csv
+import io
+import uuid
 from pathlib import Path
-from urllib.parse import quote
+from urllib.parse import quote, urlparse
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 import sys
+import logging
+import click
+from collections import namedtuple, defaultdict
+from datetime import datetime, timezone
+from contextlib import contextmanager
+
+try:
+    import gevent
+    from gevent import monkey
+except ImportError:  # Plain `python app.py` without gevent installed
+    gevent = None
+    monkey = None
 
 app = Flask(__name__)
-thread_local = threading.local()
+
+# LOG_LEVEL applies to the scanner's own logs; set it to WARNING to silence the hot path
+logging.basicConfig(format='%(asctime)s %(levelname)s pid=%(process)d %(message)s')
+logger = logging.getLogger('scanner')
+logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO').upper())
 
 LEADERBOARD_FILE = 'leaderboard.json'
+LEADERBOARD_DB = os.environ.get('LEADERBOARD_DB', str(Path(__file__).resolve().parent / 'leaderboard.db'))
+LEADERBOARD_SIZE = 100
+
+LEADERBOARD_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS scores (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    time NUMERIC NOT NULL,
+    moves INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS scores_rank ON scores (time, moves, id);
+'''
+
+# Shared on-disk store used by every gunicorn worker
+SCANNER_DB = os.environ.get('SCANNER_DB', str(Path(__file__).resolve().parent / 'scanner.db'))
+
+# Result cache settings (seconds / rows)
+CACHE_TTL = int(os.environ.get('CACHE_TTL', 7 * 24 * 3600))
+CACHE_NEGATIVE_TTL = int(os.environ.get('CACHE_NEGATIVE_TTL', 6 * 3600))
+CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', 5000))
+# Stored ETag/Last-Modified validators (rows), the least recently written evicted first
+VALIDATORS_MAX_ENTRIES = int(os.environ.get('VALIDATORS_MAX_ENTRIES', 20000))
+
+# Employee count patterns and their confidence. Each has exactly one capturing
+# group holding the number, optionally with a "k" suffix for thousands.
+EMPLOYEE_PATTERNS = [
+    (r'number of employees[:\s]*(\d[\d,\.]*k?)', 0.95),
+    (r'employee count[:\s]*(\d[\d,\.]*k?)', 0.95),
+    (r'company size[:\s]*(\d[\d,\.]*k?)', 0.9),
+    (r'(\d[\d,\.]*)\s*total employees', 0.9),
+    (r'(\d[\d,\.]*)\s*employees worldwide', 0.85),
+    (r'(?:approximately|about|over|more than)\s*(\d[\d,\.]*k?)\+?\s*employees', 0.85),
+    (r'global workforce of\s*(\d[\d,\.]*k?)', 0.85),
+    (r'workforce of\s*(\d[\d,\.]*k?)', 0.8),
+    (r'employs\s*(\d[\d,\.]*k?)', 0.8),
+    (r'(\d[\d,\.]*k)\+?\s*employees', 0.8),
+    (r'(\d[\d,\.]*)[\+\s]*employees', 0.75),
+    (r'team size[:\s]*(\d[\d,\.]*k?)', 0.7),
+    (r'team of\s*(\d[\d,\.]*k?)', 0.6),
+    (r'(\d[\d,\.]*)[\+\s]*staff', 0.6),
+    (r'(\d[\d,\.]*)[\+\s]*workers', 0.5),
+    (r'(\d[\d,\.]*)\s*professionals', 0.4),
+    (r'(\d[\d,\.]*)\s*people', 0.3)
+]
+# The lookahead lists how each pattern can start, letting the scanner skip other
+# positions without trying every alternative
+EMPLOYEE_COUNT_RE = re.compile(
+    r'(?=\d|number|employ|company|approx|about|over|more|global|workforce|team)(?:'
+    + '|'.join(f'(?:{pattern})' for pattern, _ in EMPLOYEE_PATTERNS) + ')'
+)
+EMPLOYEE_KEYWORDS = ('employ', 'staff', 'worker', 'workforce', 'team', 'people', 'professional', 'company size')
+
+# Download limits: bodies are cut off after MAX_BODY_BYTES, other content types skipped
+MAX_BODY_BYTES = int(os.environ.get('MAX_BODY_BYTES', 1024 * 1024))
+PAGE_CONTENT_TYPES = ('text/html', 'application/xhtml+xml', 'text/plain')
+
+# Parsing limits: only the first MAX_PARSE_BYTES of a page are parsed
+MAX_PARSE_BYTES = int(os.environ.get('MAX_PARSE_BYTES', 512 * 1024))
+HIDDEN_TAGS = ('script', 'style', 'noscript', 'template', 'svg')
+HTML_PARSER = lxml.html.HTMLParser(encoding='utf-8', remove_comments=True, remove_pis=True)
+# Google result pages are parsed only for the cite and snippet nodes
+GOOGLE_STRAINER = SoupStrainer(class_=['iUh30', 'VwiC3b', 'IsZvec', 'MUxGbd'])
+
+COMPANY_SUFFIXES = {'pte', 'ltd', 'limited', 'private', 'llp', 'inc', 'plc'}
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS result_cache (
+    key TEXT PRIMARY KEY,
+    result TEXT NOT NULL,
+    found INTEGER NOT NULL,
+    fetched_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS result_cache_accessed ON result_cache (accessed_at);
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    refresh INTEGER NOT NULL,
+    budget REAL NOT NULL,
+    total INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    owner TEXT,
+    lease_until REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+CREATE TABLE IF NOT EXISTS job_items (
+    job_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    company TEXT NOT NULL,
+    key TEXT NOT NULL,
+    result TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (job_id, position)
+);
+CREATE INDEX IF NOT EXISTS job_items_key ON job_items (job_id, key);
+CREATE TABLE IF NOT EXISTS http_validators (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    extraction TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS http_validators_updated ON http_validators (updated_at);
+CREATE TABLE IF NOT EXISTS lookup_locks (
+    key TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS metrics (
+    worker TEXT NOT NULL,
+    name TEXT NOT NULL,
+    labels TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (worker, name, labels)
+);
+CREATE TABLE IF NOT EXISTS strategy_stats (
+    kind TEXT NOT NULL,
+    strategy TEXT NOT NULL,
+    attempts INTEGER NOT NULL,
+    hits INTEGER NOT NULL,
+    PRIMARY KEY (kind, strategy)
+);
+CREATE TABLE IF NOT EXISTS company_hints (
+    key TEXT PRIMARY KEY,
+    linkedin_slug TEXT,
+    website TEXT,
+    seeded_at REAL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS directory (
+    key TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    uen TEXT,
+    website TEXT,
+    linkedin_slug TEXT,
+    employee_count INTEGER,
+    headcount_band TEXT,
+    is_sg INTEGER NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS directory_tokens (
+    token TEXT NOT NULL,
+    key TEXT NOT NULL,
+    PRIMARY KEY (token, key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS host_buckets (
+    host TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+'''
+
+# Fetch concurrency limits, per worker process
+FETCH_CONCURRENCY = int(os.environ.get('FETCH_CONCURRENCY', 20))
+FETCH_HOST_CONCURRENCY = int(os.environ.get('FETCH_HOST_CONCURRENCY', 4))
+SEARCH_CONCURRENCY = int(os.environ.get('SEARCH_CONCURRENCY', 10))
+
+# Per-host request rates as (requests per second, burst), shared by all workers
+HOST_RATE_LIMITS = {
+    'google.com': (2.0, 5),
+    'linkedin.com': (1.0, 4)
+}
+DEFAULT_HOST_RATE = (4.0, 8)
+
+# Offline replay harness (see benchmarks/replay_server.py): CASSETTE_DB records
+# every fetched response, REPLAY_URL sends every fetch to a replay server instead
+CASSETTE_DB = os.environ.get('CASSETTE_DB')
+REPLAY_URL = os.environ.get('REPLAY_URL', '').rstrip('/')
+RATE_LIMITS_ENABLED = os.environ.get('RATE_LIMITS_ENABLED', '1') not in ('0', 'false', 'no')
+
+CASSETTE_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS responses (
+    url TEXT PRIMARY KEY,
+    status INTEGER NOT NULL,
+    content_type TEXT NOT NULL,
+    body TEXT NOT NULL,
+    recorded_at REAL NOT NULL
+);
+'''
+
+# Attempt strategies per source. Stats on which ones find counts decide the
+# order they are tried in and, once there is enough data, which are skipped.
+LINKEDIN_SLUGS = {
+    'name': lambda name: name.lower(),
+    'hyphenated': lambda name: name.lower().replace(' ', '-'),
+    'singapore': lambda name: f"{name.lower()}-singapore",
+    'no_suffix': lambda name: name.lower().replace('pte', '').replace('ltd', '').strip()
+}
+WEBSITE_PATHS = ['', '/about', '/about-us', '/company', '/about-company', '/careers']
+GOOGLE_QUERIES = [
+    '{} singapore number of employees',
+    '{} singapore company size',
+    '{} singapore total employees',
+    '{} singapore employee count linkedin',
+    '{} singapore how many employees',
+    '{} singapore workforce size'
+]
+STRATEGY_KEEP = {'linkedin_slug': 2, 'website_path': 3, 'google_query': 3}
+STRATEGY_MIN_ATTEMPTS = 20
+STRATEGY_EXPLORATION = 0.1
+STRATEGY_STATS_TTL = 60
+# Seconds between starting successive strategies, best ranked first, so a quick
+# hit cancels the rest before they send anything
+STRATEGY_STAGGER = 0.5
+
+# Bulk company directory (flask import-directory). Exact name matches newer than
+# DIRECTORY_TTL answer lookups directly; older ones and close fuzzy matches only
+# seed LinkedIn slugs and websites.
+DIRECTORY_TTL = int(os.environ.get('DIRECTORY_TTL', 180 * 24 * 3600))
+DIRECTORY_BATCH = 5000
+DIRECTORY_FUZZY_THRESHOLD = 0.75
+DIRECTORY_FUZZY_CANDIDATES = 20
+# Tokens on more entries than this are too common to narrow a fuzzy search
+DIRECTORY_MAX_TOKEN_ENTRIES = 200
+DIRECTORY_STOP_TOKENS = {
+    'singapore', 'sg', 'asia', 'pacific', 'holdings', 'group', 'international', 'services',
+    'the', 'and', '&', 'of', 'company', 'co', 'corporation', 'corp', 'enterprise', 'enterprises',
+    'trading', 'technologies', 'technology', 'solutions', 'management', 'investments'
+}
+# Accepted column names for each directory field, in CSV headers or JSONL keys
+DIRECTORY_COLUMNS = {
+    'name': ('name', 'company', 'company_name', 'entity_name'),
+    'uen': ('uen',),
+    'website': ('website', 'domain', 'url'),
+    'linkedin_slug': ('linkedin_slug', 'linkedin', 'linkedin_url'),
+    'employee_count': ('employee_count', 'employees', 'headcount'),
+    'headcount_band': ('headcount_band', 'company_size', 'size'),
+    'is_sg': ('is_sg',),
+    'updated_at': ('updated_at',)
+}
+
+# Default and maximum time budget for one company lookup (seconds)
+LOOKUP_BUDGET = float(os.environ.get('LOOKUP_BUDGET', 30))
+MAX_LOOKUP_BUDGET = 110
+
+# Cross-worker lookup locks: held for the lookup budget plus a grace period,
+# polled by waiting workers every LOOKUP_LOCK_POLL seconds
+LOOKUP_LOCK_GRACE = 15
+LOOKUP_LOCK_POLL = 0.5
+
+# Seconds between heartbeat events on /search/stream
+STREAM_HEARTBEAT = 5
+
+# Background job settings
+MAX_JOB_COMPANIES = int(os.environ.get('MAX_JOB_COMPANIES', 5000))
+JOB_CONCURRENCY = int(os.environ.get('JOB_CONCURRENCY', 5))
+JOB_LEASE = 300
+# Finished jobs and their results are deleted this long after completion (seconds)
+JOB_RETENTION = int(os.environ.get('JOB_RETENTION', 7 * 24 * 3600))
+# Lookups that raise are retried before the error is saved as the result
+JOB_MAX_ATTEMPTS = 3
+JOB_POLL_INTERVAL = 2
+JOB_CSV_FIELDS = ['company', 'employee_count', 'is_sg', 'source', 'url']
+
+# Metrics are kept per worker and flushed to scanner.db for /metrics to sum
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') not in ('0', 'false', 'no')
+METRICS_FLUSH_INTERVAL = 5
+LATENCY_BUCKETS = (0.005, 0.025, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+METRICS = {
+    'scanner_fetch_seconds': ('histogram', 'HTTP fetch latency by host'),
+    'scanner_fetch_total': ('counter', 'HTTP fetches by host and final status'),
+    'scanner_fetch_bytes_total': ('counter', 'Response bytes downloaded by host'),
+    'scanner_rate_limit_wait_seconds_total': ('counter', 'Time spent waiting for host rate limit tokens'),
+    'scanner_rate_limit_skipped_total': ('counter', 'Requests skipped because their rate limit wait ran past the lookup deadline'),
+    'scanner_retries_total': ('counter', 'Retries made by the HTTP adapter by host and status'),
+    'scanner_parse_seconds': ('histogram', 'HTML parse time by parser'),
+    'scanner_extract_seconds': ('histogram', 'Employee count extraction time'),
+    'scanner_pattern_hits_total': ('counter', 'Winning employee count pattern per extraction'),
+    'scanner_source_seconds': ('histogram', 'Time spent per source lookup'),
+    'scanner_source_total': ('counter', 'Source lookups by outcome'),
+    'scanner_cache_total': ('counter', 'Result cache lookups by outcome'),
+    'scanner_lookup_seconds': ('histogram', 'Company lookup latency, cache included'),
+    'scanner_search_seconds': ('histogram', 'Search request latency by endpoint'),
+    'scanner_search_companies_total': ('counter', 'Companies requested by endpoint'),
+    'scanner_directory_total': ('counter', 'Directory lookups by outcome'),
+    'process_cpu_seconds_total': ('counter', 'CPU time used by worker processes')
+}
 
-def load_leaderboard():
+# A fetched page; extracted is what a previous fetch found when not_modified is set
+Page = namedtuple('Page', ['url', 'status_code', 'text', 'not_modified', 'extracted'])
+
+db_lock = threading.RLock()
+db_state = {'conn': None, 'pid': None}
+leaderboard_state = {'conn': None, 'pid': None, 'top': None}
+cassette_state = {'conn': None, 'pid': None}
+
+job_runner_state = {'pid': None}
+metrics_flusher_state = {'pid': None}
+strategy_cache = {}
+
+metrics_lock = threading.Lock()
+metrics_state = {'values': defaultdict(float), 'histograms': {}, 'flushed_at': 0, 'worker': None, 'pid': None}
+# Rendered series keys, cached per (name, labels) so the hot path skips formatting
+series_keys = {}
+
+# In-progress lookups in this worker, keyed on normalized company name
+inflight_lock = threading.Lock()
+inflight = {}
+
+session_lock = threading.Lock()
+session_state = {'session': None, 'pid': None}
+host_slots = {}
+fetch_slots = threading.BoundedSemaphore(FETCH_CONCURRENCY)
+
+def get_leaderboard_db():
+    """Return this process's leaderboard connection, importing leaderboard.json on first use."""
+    if leaderboard_state['conn'] is None or leaderboard_state['pid'] != os.getpid():
+        conn = sqlite3.connect(LEADERBOARD_DB, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.executescript(LEADERBOARD_SCHEMA)
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # user_version marks the one-time import so it never repeats
+            if conn.execute('PRAGMA user_version').fetchone()[0] == 0:
+                conn.executemany(
+                    'INSERT INTO scores (name, time, moves) VALUES (?, ?, ?)',
+                    [(score['name'], score['time'], score['moves']) for score in load_legacy_leaderboard()]
+                )
+                conn.execute('PRAGMA user_version = 1')
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        leaderboard_state['conn'] = conn
+        leaderboard_state['pid'] = os.getpid()
+        leaderboard_state['top'] = None
+    return leaderboard_state['conn']
+
+def load_legacy_leaderboard():
     try:
         with open(LEADERBOARD_FILE, 'r') as f:
             return json.load(f)
     except FileNotFoundError:
         return []
 
-def save_leaderboard(scores):
-    with open(LEADERBOARD_FILE, 'w') as f:
-        json.dump(scores, f)
+def top_scores():
+    """Return the top 10 scores, cached until any worker writes to the leaderboard."""
+    with db_lock:
+        conn = get_leaderboard_db()
+        # data_version changes whenever another connection commits to the database
+        version = conn.execute('PRAGMA data_version').fetchone()[0]
+        cached = leaderboard_state['top']
+        if cached and cached[0] == version:
+            return cached[1]
+        scores = [
+            {'name': name, 'time': seconds, 'moves': moves}
+            for name, seconds, moves in conn.execute(
+                'SELECT name, time, moves FROM scores ORDER BY time, moves, id LIMIT 10'
+            )
+        ]
+        leaderboard_state['top'] = (version, scores)
+        return scores
+
+def add_score(name, seconds, moves):
+    """Insert a score and trim the board to LEADERBOARD_SIZE in one transaction."""
+    with db_lock:
+        conn = get_leaderboard_db()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('INSERT INTO scores (name, time, moves) VALUES (?, ?, ?)', (name, seconds, moves))
+            conn.execute(
+                'DELETE FROM scores WHERE id NOT IN ('
+                'SELECT id FROM scores ORDER BY time, moves, id LIMIT ?)',
+                (LEADERBOARD_SIZE,)
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        # Our own commits don't change data_version, so drop the cache directly
+        leaderboard_state['top'] = None
+
+def get_db():
+    """Return this process's connection to the shared scanner database."""
+    # Connections must not be shared across fork, so key them on the pid
+    if db_state['conn'] is None or db_state['pid'] != os.getpid():
+        conn = sqlite3.connect(SCANNER_DB, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.executescript(SCHEMA)
+        db_state['conn'] = conn
+        db_state['pid'] = os.getpid()
+    return db_state['conn']
+
+def format_labels(labels):
+    """Render labels in Prometheus exposition format, e.g. {host="google.com"}."""
+    if not labels:
+        return ''
+    pairs = []
+    for name, value in sorted(labels.items()):
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+def metric_values():
+    """Return this process's series, starting afresh in a forked child. Call under metrics_lock."""
+    if metrics_state['pid'] != os.getpid():
+        metrics_state['pid'] = os.getpid()
+        metrics_state['worker'] = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        metrics_state['values'] = defaultdict(float)
+        metrics_state['histograms'] = {}
+    return metrics_state['values']
+
+def series_key(name, labels):
+    """Return the (name, rendered labels) key of a counter series."""
+    cache_key = (name, tuple(labels.items()))
+    key = series_keys.get(cache_key)
+    if key is None:
+        key = series_keys[cache_key] = (name, format_labels(labels))
+    return key
+
+def histogram_keys(name, labels):
+    """Return the bucket, sum and count series keys of a histogram."""
+    cache_key = ('histogram', name, tuple(labels.items()))
+    keys = series_keys.get(cache_key)
+    if keys is None:
+        buckets = [(name + '_bucket', format_labels(dict(labels, le=bound)))
+                   for bound in LATENCY_BUCKETS + ('+Inf',)]
+        keys = series_keys[cache_key] = (
+            tuple(buckets),
+            (name + '_sum', format_labels(labels)),
+            (name + '_count', format_labels(labels))
+        )
+    return keys
+
+def inc(name, amount=1, **labels):
+    """Add to a counter series."""
+    if not METRICS_ENABLED:
+        return
+    key = series_key(name, labels)
+    with metrics_lock:
+        metric_values()[key] += amount
+    flush_metrics()
+
+def observe(name, value, **labels):
+    """Record a histogram observation.
+
+    Only the observation's own bucket is counted here; flush_metrics() expands
+    the counts into cumulative bucket, sum and count series.
+    """
+    if not METRICS_ENABLED:
+        return
+    keys = histogram_keys(name, labels)
+    index = bisect.bisect_left(LATENCY_BUCKETS, value)
+    with metrics_lock:
+        metric_values()
+        histogram = metrics_state['histograms'].get(keys)
+        if histogram is None:
+            histogram = metrics_state['histograms'][keys] = [0] * (len(LATENCY_BUCKETS) + 1) + [0.0]
+        histogram[index] += 1
+        histogram[-1] += value
+    flush_metrics()
+
+@contextmanager
+def timed(name, **labels):
+    """Observe how long the with-block takes in a histogram."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+def flush_metrics(force=False):
+    """Write this worker's series to the shared store, at most every METRICS_FLUSH_INTERVAL."""
+    now = time.time()
+    if not force and now - metrics_state['flushed_at'] < METRICS_FLUSH_INTERVAL:
+        return
+    with metrics_lock:
+        values = metric_values()
+        metrics_state['flushed_at'] = now
+        values[('process_cpu_seconds_total', '')] = time.process_time()
+        rows = [(metrics_state['worker'], name, labels, value) for (name, labels), value in values.items()]
+        # Every bucket gets a series, even at zero, so quantiles can be computed
+        for (buckets, sum_key, count_key), histogram in metrics_state['histograms'].items():
+            total = 0
+            for key, count in zip(buckets, histogram):
+                total += count
+                rows.append((metrics_state['worker'], key[0], key[1], total))
+            rows.append((metrics_state['worker'], sum_key[0], sum_key[1], histogram[-1]))
+            rows.append((metrics_state['worker'], count_key[0], count_key[1], total))
+    try:
+        with db_lock:
+            get_db().executemany(
+                'INSERT OR REPLACE INTO metrics (worker, name, labels, value) VALUES (?, ?, ?, ?)', rows
+            )
+    except sqlite3.Error as e:
+        logger.warning('metrics_flush_error error=%s', e)
+
+def series_order(row):
+    """Sort key keeping histogram buckets in ascending numeric order."""
+    name, labels, _ = row
+    match = re.search(r'le="([^"]+)"', labels)
+    return name, re.sub(r',?le="[^"]+"', '', labels), float(match.group(1)) if match else 0
+
+def render_metrics():
+    """Sum every worker's series and render them in Prometheus text format."""
+    flush_metrics(force=True)
+    with db_lock:
+        rows = get_db().execute(
+            'SELECT name, labels, SUM(value) FROM metrics GROUP BY name, labels'
+        ).fetchall()
+    rows.sort(key=series_order)
+
+    lines = []
+    described = set()
+    for name, labels, value in rows:
+        family = re.sub(r'_(bucket|sum|count)$', '', name) if name not in METRICS else name
+        if family in METRICS and family not in described:
+            kind, help_text = METRICS[family]
+            lines.append(f'# HELP {family} {help_text}')
+            lines.append(f'# TYPE {family} {kind}')
+            described.add(family)
+        lines.append(f'{name}{labels} {value:g}')
+    return '\n'.join(lines) + '\n'
+
+def record_response(url, status, content_type, body):
+    """Save a fetched response to the cassette store for later replay.
+
+    The body is stored decoded and replayed as UTF-8, so the recorded charset is
+    rewritten to match.
+    """
+    content_type = re.sub(r'charset=[^;]*', 'charset=utf-8', content_type, flags=re.IGNORECASE)
+    try:
+        with db_lock:
+            if cassette_state['conn'] is None or cassette_state['pid'] != os.getpid():
+                conn = sqlite3.connect(CASSETTE_DB, timeout=30, isolation_level=None, check_same_thread=False)
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.executescript(CASSETTE_SCHEMA)
+                cassette_state['conn'] = conn
+                cassette_state['pid'] = os.getpid()
+            cassette_state['conn'].execute(
+                'INSERT OR REPLACE INTO responses (url, status, content_type, body, recorded_at) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (url, status, content_type, body, time.time())
+            )
+    except sqlite3.Error as e:
+        logger.warning('cassette_write_error url=%s error=%s', url, e)
+
+def normalize_company_name(company_name):
+    """Normalize a company name for use as a lookup key."""
+    words = re.sub(r'[^a-z0-9&]+', ' ', company_name.lower()).split()
+    # Drop trailing legal suffixes such as "Pte Ltd", keeping at least one word
+    while len(words) > 1 and words[-1] in COMPANY_SUFFIXES:
+        words.pop()
+    return ' '.join(words)
+
+def cache_get(company_name, fetched_since=0):
+    """Return a cached result for the company if it has not expired.
+
+    fetched_since skips results fetched before that time, for callers that
+    need a result newer than the one they would otherwise be served.
+    """
+    key = normalize_company_name(company_name)
+    now = time.time()
+    try:
+        with db_lock:
+            conn = get_db()
+            row = conn.execute(
+                'SELECT result, found, fetched_at FROM result_cache WHERE key = ?', (key,)
+            ).fetchone()
+            if not row:
+                return None
+            result, found, fetched_at = row
+            if fetched_at < fetched_since:
+                return None
+            ttl = CACHE_TTL if found else CACHE_NEGATIVE_TTL
+            if now - fetched_at > ttl:
+                conn.execute('DELETE FROM result_cache WHERE key = ?', (key,))
+                return None
+            conn.execute('UPDATE result_cache SET accessed_at = ? WHERE key = ?', (now, key))
+    except sqlite3.Error as e:
+        logger.warning('cache_read_error company=%r error=%s', company_name, e)
+        return None
+
+    result = json.loads(result)
+    result['company'] = company_name
+    result['cached'] = True
+    result['fetched_at'] = fetched_at
+    return result
+
+def cache_put(company_name, result):
+    """Store a lookup result and evict the least recently used entries."""
+    key = normalize_company_name(company_name)
+    now = time.time()
+    found = result.get('employee_count') != 'Not found'
+    try:
+        with db_lock:
+            conn = get_db()
+            conn.execute(
+                'INSERT OR REPLACE INTO result_cache (key, result, found, fetched_at, accessed_at) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (key, json.dumps(result), int(found), now, now)
+            )
+            conn.execute(
+                'DELETE FROM result_cache WHERE key IN ('
+                'SELECT key FROM result_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)',
+                (CACHE_MAX_ENTRIES,)
+            )
+    except sqlite3.Error as e:
+        logger.warning('cache_write_error company=%r error=%s', company_name, e)
+
+def gevent_patched():
+    """Return True when running under a monkey-patched gevent worker."""
+    return monkey is not None and monkey.is_module_patched('socket')
+
+def spawn(func, *args):
+    """Start func in a greenlet under gevent workers, or a daemon thread otherwise."""
+    if gevent_patched():
+        return gevent.spawn(func, *args)
+    thread = threading.Thread(target=func, args=args, daemon=True)
+    thread.start()
+    return thread
+
+def run_concurrently(func, items, limit, timeout=None):
+    """Call func on each item with at most `limit` calls running at once.
+
+    Yields (item, result, error) tuples in completion order. When `timeout` is
+    set, None is yielded whenever that many seconds pass without a completion.
+    Closing the generator early stops any further calls from starting and, under
+    gevent, kills the ones still running.
+    """
+    items = list(items)
+    done = queue.Queue()
+    slots = threading.BoundedSemaphore(max(1, limit))
+    stopped = threading.Event()
+    workers = []
+
+    def worker(item):
+        try:
+            done.put((item, func(item), None))
+        except Exception as e:
+            done.put((item, None, e))
+        finally:
+            slots.release()
+
+    def feeder():
+        for item in items:
+            slots.acquire()
+            if stopped.is_set():
+                return
+            workers.append(spawn(worker, item))
+
+    workers.append(spawn(feeder))
+    try:
+        for _ in items:
+            while True:
+                try:
+                    yield done.get(timeout=timeout)
+                    break
+                except queue.Empty:
+                    yield None
+    finally:
+        stopped.set()
+        # As in race(), plain threads already running finish in the background
+        if gevent_patched():
+            gevent.killall([worker for worker in workers if isinstance(worker, gevent.Greenlet)], block=False)
+
+def race(tasks, deadline, delays=None):
+    """Run zero-argument tasks concurrently and return the winning result.
+
+    Tasks are given in priority order; a result wins once every higher-priority
+    task has finished without one. If the deadline passes first, the best result
+    so far is returned. Tasks still running or waiting out their delays (seconds
+    before each task starts) are then cancelled.
+
+    None is returned only when every task finished without a result. If the
+    deadline passed or a task raised instead, LookupIncomplete is raised.
+    """
+    outcomes = queue.Queue()
+    results = [None] * len(tasks)
+    finished = [False] * len(tasks)
+    incomplete = False
+    cancelled = threading.Event()
+
+    def run(index, task, delay):
+        if delay and cancelled.wait(delay):
+            return
+        try:
+            outcomes.put((index, task(), False))
+        except LookupIncomplete as e:
+            logger.debug('race_task_incomplete error=%s', e)
+            outcomes.put((index, None, True))
+        except Exception as e:
+            logger.warning('race_task_error error=%s', e)
+            outcomes.put((index, None, True))
+
+    delays = delays or [0] * len(tasks)
+    workers = [spawn(run, index, task, delay) for index, (task, delay) in enumerate(zip(tasks, delays))]
+    try:
+        while True:
+            for index in range(len(tasks)):
+                if results[index]:
+                    return results[index]
+                if not finished[index]:
+                    break
+            else:
+                if incomplete:
+                    raise LookupIncomplete('not every task could finish')
+                return None
+
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                best = next((result for result in results if result), None)
+                if best is None:
+                    raise LookupIncomplete('deadline passed')
+                return best
+            try:
+                index, result, failed = outcomes.get(timeout=remaining)
+            except queue.Empty:
+                continue
+            finished[index] = True
+            results[index] = result
+            incomplete = incomplete or failed
+    finally:
+        # Greenlets can be killed mid-request; plain threads finish in the background
+        cancelled.set()
+        if gevent_patched():
+            gevent.killall([worker for worker in workers if isinstance(worker, gevent.Greenlet)], block=False)
 
 def get_session():
-    if not hasattr(thread_local, "session"):
-        session = requests.Session()
-        
-        # More realistic user agents
-        user_agents = [
-            'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36',
-            'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36',
-            'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/119.0',
-            'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.6 Safari/605.1.15',
-            'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Edge/119.0.0.0'
-        ]
-        
-        headers = {
-            'User-Agent': random.choice(user_agents),
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.9',
-            'Accept-Encoding': 'gzip, deflate, br',
-            'DNT': '1',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1',
-            'Sec-Fetch-Dest': 'document',
-            'Sec-Fetch-Mode': 'navigate',
-            'Sec-Fetch-Site': 'none',
-            'Sec-Fetch-User': '?1',
-            'Cache-Control': 'max-age=0',
-            'Sec-Ch-Ua': '"Google Chrome";v="119", "Chromium";v="119", "Not?A_Brand";v="24"',
-            'Sec-Ch-Ua-Mobile': '?0',
-            'Sec-Ch-Ua-Platform': '"macOS"'
-        }
-        
-        session.headers.update(headers)
-        
-        # Configure retry strategy with longer delays
-        retry_strategy = Retry(
-            total=3,
-            backoff_factor=1.5,
-            status_forcelist=[429, 500, 502, 503, 504],
-            allowed_methods=["HEAD", "GET", "POST", "OPTIONS"]
+    """Return the HTTP session shared by every request in this worker."""
+    with session_lock:
+        if session_state['session'] is None or session_state['pid'] != os.getpid():
+            session_state['session'] = create_session()
+            session_state['pid'] = os.getpid()
+        return session_state['session']
+
+def create_session():
+    session = requests.Session()
+
+    # More realistic user agents
+    user_agents = [
+        'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36',
+        'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36',
+        'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/119.0',
+        'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.6 Safari/605.1.15',
+        'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Edge/119.0.0.0'
+    ]
+
+    headers = {
+        'User-Agent': random.choice(user_agents),
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
+        'Accept-Language': 'en-US,en;q=0.9',
+        'Accept-Encoding': 'gzip, deflate, br',
+        'DNT': '1',
+        'Connection': 'keep-alive',
+        'Upgrade-Insecure-Requests': '1',
+        'Sec-Fetch-Dest': 'document',
+        'Sec-Fetch-Mode': 'navigate',
+        'Sec-Fetch-Site': 'none',
+        'Sec-Fetch-User': '?1',
+        'Cache-Control': 'max-age=0',
+        'Sec-Ch-Ua': '"Google Chrome";v="119", "Chromium";v="119", "Not?A_Brand";v="24"',
+        'Sec-Ch-Ua-Mobile': '?0',
+        'Sec-Ch-Ua-Platform': '"macOS"'
+    }
+
+    session.headers.update(headers)
+
+    # Configure retry strategy with longer delays
+    retry_strategy = CountingRetry(
+        total=3,
+        backoff_factor=1.5,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=["HEAD", "GET", "POST", "OPTIONS"]
+    )
+
+    # One connection pool per host, sized for the worker-wide fetch limit
+    adapter = HTTPAdapter(
+        max_retries=retry_strategy,
+        pool_connections=50,
+        pool_maxsize=FETCH_CONCURRENCY
+    )
+
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    return session
+
+class CountingRetry(Retry):
+    """Retry strategy that counts every retry it makes in scanner_retries_total."""
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        host = host_label(_pool.host) if _pool is not None and _pool.host else ''
+        if response is not None:
+            status = response.status
+        else:
+            status = type(error).__name__ if error else 'unknown'
+        inc('scanner_retries_total', host=host, status=status)
+        return super().increment(method, url, response, error, _pool, _stacktrace)
+
+def get_host_slots(host):
+    """Return the semaphore limiting concurrent requests to a host."""
+    with session_lock:
+        slots = host_slots.get(host)
+        if slots is None:
+            slots = host_slots[host] = threading.BoundedSemaphore(FETCH_HOST_CONCURRENCY)
+        return slots
+
+def rate_limit_key(host):
+    """Map a hostname to the bucket it draws from, e.g. www.google.com -> google.com."""
+    host = host.lower()
+    for domain in HOST_RATE_LIMITS:
+        if host == domain or host.endswith('.' + domain):
+            return domain
+    return host[4:] if host.startswith('www.') else host
+
+class LookupIncomplete(Exception):
+    """Raised when part of a lookup could not finish, so finding nothing is not conclusive."""
+
+class DeadlineExceeded(LookupIncomplete):
+    """Raised by fetch() when a request could not start before the lookup deadline."""
+
+def raise_if_inconclusive(page):
+    """Raise LookupIncomplete for responses that say nothing about the page itself."""
+    # 429 and 5xx (and LinkedIn's 999) mean throttled or down, not "no count here"
+    if page.status_code == 429 or page.status_code >= 500:
+        raise LookupIncomplete(f"HTTP {page.status_code} from {page.url}")
+
+def host_label(host):
+    """Return the metrics label for a host: its rate limit bucket if it has one, else 'other'.
+
+    Company websites are unbounded, so they share one label rather than each
+    adding their own series.
+    """
+    key = rate_limit_key(host)
+    return key if key in HOST_RATE_LIMITS else 'other'
+
+def reserve_host_token(host, deadline=None):
+    """Take a token from the host's shared bucket and return how long to wait for it.
+
+    Tokens may go negative, which queues callers in reservation order instead of
+    having them poll the bucket. When the wait would run past deadline nothing is
+    reserved and None is returned.
+    """
+    if not RATE_LIMITS_ENABLED:
+        return 0
+    key = rate_limit_key(host)
+    rate, burst = HOST_RATE_LIMITS.get(key, DEFAULT_HOST_RATE)
+    try:
+        with db_lock:
+            conn = get_db()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                now = time.time()
+                row = conn.execute(
+                    'SELECT tokens, updated_at FROM host_buckets WHERE host = ?', (key,)
+                ).fetchone()
+                tokens = burst if row is None else min(burst, row[0] + (now - row[1]) * rate)
+                tokens -= 1
+                if deadline is not None and now + max(0.0, -tokens / rate) > deadline:
+                    conn.execute('ROLLBACK')
+                    return None
+                conn.execute(
+                    'INSERT OR REPLACE INTO host_buckets (host, tokens, updated_at) VALUES (?, ?, ?)',
+                    (key, tokens, now)
+                )
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+    except sqlite3.Error as e:
+        logger.warning('rate_limiter_error host=%s error=%s', key, e)
+        return 0
+    return max(0.0, -tokens / rate)
+
+def refund_host_token(host):
+    """Return a reserved token to the host's bucket when its request was never sent."""
+    if not RATE_LIMITS_ENABLED:
+        return
+    key = rate_limit_key(host)
+    rate, burst = HOST_RATE_LIMITS.get(key, DEFAULT_HOST_RATE)
+    try:
+        with db_lock:
+            get_db().execute(
+                'UPDATE host_buckets SET tokens = MIN(?, tokens + 1) WHERE host = ?', (burst, key)
+            )
+    except sqlite3.Error as e:
+        logger.warning('rate_limiter_error host=%s error=%s', key, e)
+
+def get_validators(url):
+    """Return (etag, last_modified, extraction) stored for a URL, or None."""
+    with db_lock:
+        return get_db().execute(
+            'SELECT etag, last_modified, extraction FROM http_validators WHERE url = ?', (url,)
+        ).fetchone()
+
+def save_validators(url, etag, last_modified):
+    # A new body invalidates whatever was extracted from the old one
+    with db_lock:
+        conn = get_db()
+        conn.execute(
+            'INSERT OR REPLACE INTO http_validators (url, etag, last_modified, extraction, updated_at) '
+            'VALUES (?, ?, ?, NULL, ?)',
+            (url, etag, last_modified, time.time())
         )
-        
-        # Configure connection pooling and timeouts
-        adapter = HTTPAdapter(
-            max_retries=retry_strategy,
-            pool_connections=10,
-            pool_maxsize=10
+        conn.execute(
+            'DELETE FROM http_validators WHERE url IN ('
+            'SELECT url FROM http_validators ORDER BY updated_at DESC LIMIT -1 OFFSET ?)',
+            (VALIDATORS_MAX_ENTRIES,)
         )
-        
-        session.mount("http://", adapter)
-        session.mount("https://", adapter)
-        
-        thread_local.session = session
-    
-    return thread_local.session
+
+def remember_extraction(url, result):
+    """Record what was extracted from a URL so a later 304 can reuse it."""
+    try:
+        with db_lock:
+            get_db().execute(
+                'UPDATE http_validators SET extraction = ?, updated_at = ? WHERE url = ?',
+                (json.dumps(result), time.time(), url)
+            )
+    except sqlite3.Error as e:
+        logger.warning('validator_write_error url=%s error=%s', url, e)
+
+def read_body(response):
+    """Read a streamed body up to MAX_BODY_BYTES, abandoning the rest of the download.
+
+    Returns the decoded text and the number of bytes downloaded.
+    """
+    chunks = []
+    size = 0
+    for chunk in response.iter_content(chunk_size=16 * 1024):
+        chunks.append(chunk)
+        size += len(chunk)
+        if size >= MAX_BODY_BYTES:
+            logger.info('body_truncated url=%s limit=%d', response.url, MAX_BODY_BYTES)
+            break
+    body = b''.join(chunks)[:MAX_BODY_BYTES]
+
+    # requests assumes ISO-8859-1 when no charset is given; pages are far more often UTF-8
+    content_type = response.headers.get('Content-Type', '')
+    encoding = response.encoding if 'charset=' in content_type.lower() else 'utf-8'
+    try:
+        return body.decode(encoding or 'utf-8', 'replace'), size
+    except LookupError:
+        return body.decode('utf-8', 'replace'), size
+
+def fetch(url, timeout=(5, 15), conditional=False, deadline=None):
+    """GET a URL through the shared session within the host's rate and concurrency limits.
+
+    Bodies are streamed and capped at MAX_BODY_BYTES, and responses that are not
+    HTML or text come back with an empty body. With conditional=True the URL is
+    revalidated with its stored ETag/Last-Modified. A 304 then returns a Page with
+    not_modified set and the extraction remembered for the unchanged body.
+
+    Raises DeadlineExceeded instead of waiting for a rate limit token past deadline.
+    """
+    headers = {}
+    validators = get_validators(url) if conditional else None
+    # Only revalidate once something was extracted, otherwise a 304 has nothing to reuse
+    if validators and validators[2] is not None:
+        if validators[0]:
+            headers['If-None-Match'] = validators[0]
+        if validators[1]:
+            headers['If-Modified-Since'] = validators[1]
+
+    host = urlparse(url).hostname or ''
+    host_key = host_label(host)
+    wait = reserve_host_token(host, deadline)
+    if wait is None:
+        inc('scanner_rate_limit_skipped_total', host=host_key)
+        raise DeadlineExceeded(f"Rate limit wait for {rate_limit_key(host)} runs past the lookup deadline")
+
+    sent = False
+    try:
+        if wait:
+            # Only this greenlet waits; other hosts and companies carry on
+            inc('scanner_rate_limit_wait_seconds_total', wait, host=host_key)
+            time.sleep(wait)
+
+        # Limits and metrics still use the real host when replaying
+        request_url = f"{REPLAY_URL}/replay?url={quote(url, safe='')}" if REPLAY_URL else url
+
+        # Take the host slot first so a busy host doesn't hold global slots while waiting
+        with get_host_slots(host), fetch_slots:
+            start = time.perf_counter()
+            sent = True
+            try:
+                response = get_session().get(request_url, timeout=timeout, headers=headers, stream=True)
+            except Exception:
+                inc('scanner_fetch_total', host=host_key, status='error')
+                raise
+            try:
+                if response.status_code == 304 and headers:
+                    return Page(url, 304, '', True, json.loads(validators[2]))
+
+                content_type = response.headers.get('Content-Type', '').lower()
+                if content_type and not any(allowed in content_type for allowed in PAGE_CONTENT_TYPES):
+                    logger.debug('content_type_skipped url=%s content_type=%s', url, content_type)
+                    if CASSETTE_DB:
+                        record_response(url, response.status_code, content_type, '')
+                    return Page(url, response.status_code, '', False, None)
+
+                text, size = read_body(response)
+                inc('scanner_fetch_bytes_total', size, host=host_key)
+                if CASSETTE_DB:
+                    record_response(url, response.status_code, content_type, text)
+            finally:
+                response.close()
+                observe('scanner_fetch_seconds', time.perf_counter() - start, host=host_key)
+                inc('scanner_fetch_total', host=host_key, status=response.status_code)
+    except BaseException:
+        # A cancelled greenlet hands back the token it was waiting to use
+        if not sent:
+            refund_host_token(host)
+        raise
+
+    if conditional and response.status_code == 200:
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if etag or last_modified:
+            try:
+                save_validators(url, etag, last_modified)
+            except sqlite3.Error as e:
+                logger.warning('validator_write_error url=%s error=%s', url, e)
+    return Page(url, response.status_code, text, False, None)
+
+def check_page(url, source, deadline=None):
+    """Fetch a page and look for an employee count in its text, revalidating when possible."""
+    page = fetch(url, conditional=True, deadline=deadline)
+    if page.not_modified:
+        logger.debug('not_modified url=%s', url)
+        return page.extracted
+    raise_if_inconclusive(page)
+    if page.status_code != 200:
+        return None
+
+    text = page_text(page.text)
+    result = None
+    with timed('scanner_extract_seconds'):
+        count = find_employee_count(text)
+    if count:
+        is_sg = 'singapore' in text or ' sg ' in text
+        result = {
+            'count': count,
+            'source': source,
+            'url': url,
+            'is_sg': is_sg
+        }
+    remember_extraction(url, result)
+    return result
+
+def parse_prefix(html):
+    """Return the first MAX_PARSE_BYTES of a page as UTF-8, without splitting a character."""
+    # A character is at least one byte, so only that many characters need encoding
+    data = html[:MAX_PARSE_BYTES].encode('utf-8', 'replace')
+    if len(data) > MAX_PARSE_BYTES:
+        end = MAX_PARSE_BYTES
+        # Back off past continuation bytes to the start of the character being cut
+        while data[end] & 0xC0 == 0x80:
+            end -= 1
+        data = data[:end]
+    return data
+
+def page_text(html):
+    """Return the lowercased visible text of a page, skipping scripts and styles."""
+    with timed('scanner_parse_seconds', parser='text'):
+        try:
+            doc = lxml.html.fromstring(parse_prefix(html), parser=HTML_PARSER)
+        except etree.ParserError:
+            return ''
+        etree.strip_elements(doc, *HIDDEN_TAGS, with_tail=False)
+        return ' '.join(doc.itertext()).lower()
+
+def parse_google_results(html):
+    """Parse only the result cites and snippets of a Google results page."""
+    with timed('scanner_parse_seconds', parser='google'):
+        return BeautifulSoup(parse_prefix(html), 'lxml', parse_only=GOOGLE_STRAINER, from_encoding='utf-8')
+
+def find_employee_counts(text):
+    """Return every employee count candidate in text, most confident first.
+
+    The patterns are combined into one compiled alternation so the text is
+    scanned once. Each candidate records the matching pattern and its context.
+    Text is expected to be lowercased, as every source already does.
+    """
+    # Cheap keyword check before running the regex over the whole page
+    if not any(keyword in text for keyword in EMPLOYEE_KEYWORDS):
+        return []
+
+    candidates = []
+    for match in EMPLOYEE_COUNT_RE.finditer(text):
+        index = match.lastindex - 1
+        count_str = match.group(match.lastindex).lower().replace(',', '')
+        try:
+            if count_str.endswith('k'):
+                count = int(float(count_str[:-1]) * 1000)
+            else:
+                count = int(float(count_str))
+        except ValueError:
+            continue
+        if count <= 0:
+            continue
+
+        pattern, confidence = EMPLOYEE_PATTERNS[index]
+        candidates.append({
+            'count': count,
+            'pattern': pattern,
+            'confidence': confidence,
+            'context': text[max(0, match.start() - 40):match.end() + 40].strip()
+        })
+
+    # sorted() is stable, so equally confident candidates keep page order
+    return sorted(candidates, key=lambda candidate: -candidate['confidence'])
 
 def find_employee_count(text):
     """Extract employee count from text using various patterns."""
-    employee_patterns = [
-        r'([\d,\.]+)[\+\s]*employees',
-        r'([\d,\.]+)[\+\s]*workers',
-        r'([\d,\.]+)[\+\s]*staff',
-        r'team of\s*([\d,\.]+)',
-        r'([\d,\.]+)\s*people',
-        r'([\d,\.]+)k\+?\s*employees',
-        r'employs\s*([\d,\.]+)',
-        r'workforce of\s*([\d,\.]+)',
-        r'company size[:\s]*([\d,\.]+)',
-        r'([\d,\.]+)\s*total employees',
-        r'([\d,\.]+)\s*professionals',
-        r'approximately\s*([\d,\.]+)\s*employees',
-        r'about\s*([\d,\.]+)\s*employees',
-        r'over\s*([\d,\.]+)\s*employees',
-        r'more than\s*([\d,\.]+)\s*employees',
-        r'([\d,\.]+)\s*employees worldwide',
-        r'global workforce of\s*([\d,\.]+)',
-        r'team size[:\s]*([\d,\.]+)',
-        r'number of employees[:\s]*([\d,\.]+)',
-        r'employee count[:\s]*([\d,\.]+)'
+    candidates = find_employee_counts(text)
+    if not candidates:
+        return None
+    inc('scanner_pattern_hits_total', pattern=candidates[0]['pattern'])
+    return candidates[0]['count']
+
+def strategy_stats(kind):
+    """Return {strategy: (attempts, hits)} for a kind, re-read every STRATEGY_STATS_TTL seconds."""
+    cached = strategy_cache.get(kind)
+    if cached and time.time() - cached[0] < STRATEGY_STATS_TTL:
+        return cached[1]
+    try:
+        with db_lock:
+            rows = get_db().execute(
+                'SELECT strategy, attempts, hits FROM strategy_stats WHERE kind = ?', (kind,)
+            ).fetchall()
+    except sqlite3.Error as e:
+        logger.warning('strategy_stats_error kind=%s error=%s', kind, e)
+        rows = []
+    stats = {strategy: (attempts, hits) for strategy, attempts, hits in rows}
+    strategy_cache[kind] = (time.time(), stats)
+    return stats
+
+def plan_strategies(kind, strategies):
+    """Order strategies by historical hit rate and prune the weakest.
+
+    Hit rates are smoothed as (hits + 1) / (attempts + 2), so untried strategies
+    start at 0.5. Beyond the STRATEGY_KEEP best of a kind, strategies with at
+    least STRATEGY_MIN_ATTEMPTS attempts are skipped, except with probability
+    STRATEGY_EXPLORATION so rarely winning ones are still tried now and then.
+    """
+    stats = strategy_stats(kind)
+
+    def hit_rate(strategy):
+        attempts, hits = stats.get(strategy, (0, 0))
+        return (hits + 1) / (attempts + 2)
+
+    ordered = sorted(strategies, key=hit_rate, reverse=True)
+    keep = STRATEGY_KEEP.get(kind)
+    if keep is None:
+        return ordered
+    return [
+        strategy for rank, strategy in enumerate(ordered)
+        if rank < keep
+        or stats.get(strategy, (0, 0))[0] < STRATEGY_MIN_ATTEMPTS
+        or random.random() < STRATEGY_EXPLORATION
     ]
-    
-    for pattern in employee_patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
-        if match:
-            count_str = match.group(1).replace(',', '')
-            try:
-                if 'k' in count_str.lower():
-                    return int(float(count_str.lower().replace('k', '')) * 1000)
-                return int(float(count_str))
-            except ValueError:
-                continue
+
+def record_attempt(kind, strategy, hit):
+    """Count a finished attempt of a strategy and whether it found a count."""
+    try:
+        with db_lock:
+            get_db().execute(
+                'INSERT INTO strategy_stats (kind, strategy, attempts, hits) VALUES (?, ?, 1, ?) '
+                'ON CONFLICT (kind, strategy) DO UPDATE SET '
+                'attempts = attempts + 1, hits = hits + excluded.hits',
+                (kind, strategy, int(hit))
+            )
+    except sqlite3.Error as e:
+        logger.warning('strategy_stats_error kind=%s error=%s', kind, e)
+
+def get_hints(key):
+    """Return what earlier lookups resolved for a company: its LinkedIn slug and website.
+
+    seeded_at is when the directory last supplied them, if ever.
+    """
+    try:
+        with db_lock:
+            row = get_db().execute(
+                'SELECT linkedin_slug, website, seeded_at FROM company_hints WHERE key = ?', (key,)
+            ).fetchone()
+    except sqlite3.Error as e:
+        logger.warning('hint_read_error key=%r error=%s', key, e)
+        return {}
+    if not row:
+        return {}
+    return {'linkedin_slug': row[0], 'website': row[1], 'seeded_at': row[2]}
+
+def save_hint(key, field, value):
+    if field not in ('linkedin_slug', 'website'):
+        raise ValueError(f"Unknown hint field: {field}")
+    try:
+        with db_lock:
+            get_db().execute(
+                f'INSERT INTO company_hints (key, {field}, updated_at) VALUES (?, ?, ?) '
+                f'ON CONFLICT (key) DO UPDATE SET {field} = excluded.{field}, updated_at = excluded.updated_at',
+                (key, value, time.time())
+            )
+    except sqlite3.Error as e:
+        logger.warning('hint_write_error key=%r error=%s', key, e)
+
+def seed_hints(key, values):
+    """Store directory-supplied hints for a company and mark when they were seeded."""
+    fields = [field for field in ('linkedin_slug', 'website') if field in values]
+    now = time.time()
+    try:
+        with db_lock:
+            get_db().execute(
+                'INSERT INTO company_hints (key, {columns}seeded_at, updated_at) VALUES (?, {params}?, ?) '
+                'ON CONFLICT (key) DO UPDATE SET {updates}seeded_at = excluded.seeded_at, '
+                'updated_at = excluded.updated_at'.format(
+                    columns=''.join(f'{field}, ' for field in fields),
+                    params='?, ' * len(fields),
+                    updates=''.join(f'{field} = excluded.{field}, ' for field in fields)
+                ),
+                (key, *[values[field] for field in fields], now, now)
+            )
+    except sqlite3.Error as e:
+        logger.warning('hint_write_error key=%r error=%s', key, e)
+
+def name_tokens(key):
+    """Return the distinctive words of a normalized name, for the fuzzy index."""
+    return {word for word in key.split() if len(word) > 1 and word not in DIRECTORY_STOP_TOKENS}
+
+def trigrams(text):
+    padded = f'  {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def name_similarity(a, b):
+    """Jaccard similarity of two names' character trigrams."""
+    a, b = trigrams(a), trigrams(b)
+    return len(a & b) / len(a | b) if a and b else 0
+
+DIRECTORY_FIELDS = ('key', 'name', 'website', 'linkedin_slug', 'employee_count', 'headcount_band', 'is_sg', 'updated_at')
+
+def directory_lookup(company_name):
+    """Find a company in the directory by normalized name, then by fuzzy match.
+
+    Returns the entry as a dict with 'match' set to 'exact' or 'fuzzy', or None.
+    """
+    key = normalize_company_name(company_name)
+    with db_lock:
+        conn = get_db()
+        row = conn.execute(
+            f"SELECT {', '.join(DIRECTORY_FIELDS)} FROM directory WHERE key = ?", (key,)
+        ).fetchone()
+        if row is not None:
+            return dict(zip(DIRECTORY_FIELDS, row), match='exact', similarity=1.0)
+        candidates = directory_candidates(conn, key)
+
+    # Score outside the lock; there are at most DIRECTORY_FUZZY_CANDIDATES
+    scored = [(name_similarity(key, row[0]), row) for row in candidates]
+    similarity, best = max(scored, key=lambda pair: pair[0], default=(0, None))
+    if best is None or similarity < DIRECTORY_FUZZY_THRESHOLD:
+        return None
+    return dict(zip(DIRECTORY_FIELDS, best), match='fuzzy', similarity=similarity)
+
+def directory_candidates(conn, key):
+    """Return the directory rows sharing the most rare words with a name. Call under db_lock."""
+    tokens = []
+    for token in name_tokens(key):
+        entries = conn.execute(
+            'SELECT COUNT(*) FROM (SELECT 1 FROM directory_tokens WHERE token = ? LIMIT ?)',
+            (token, DIRECTORY_MAX_TOKEN_ENTRIES + 1)
+        ).fetchone()[0]
+        if 0 < entries <= DIRECTORY_MAX_TOKEN_ENTRIES:
+            tokens.append((entries, token))
+    if not tokens:
+        return []
+
+    # The rarest words narrow the candidates fastest
+    rarest = [token for _, token in sorted(tokens)[:3]]
+    return conn.execute(
+        f"SELECT {', '.join('d.' + field for field in DIRECTORY_FIELDS)} FROM directory d JOIN ("
+        f"SELECT key FROM directory_tokens WHERE token IN ({','.join('?' * len(rarest))}) "
+        f"GROUP BY key ORDER BY COUNT(*) DESC LIMIT ?) t ON t.key = d.key",
+        rarest + [DIRECTORY_FUZZY_CANDIDATES]
+    ).fetchall()
+
+def directory_result(company_name, entry):
+    """Build a lookup result from a directory entry with a known headcount."""
+    website = entry['website']
+    return {
+        'company': company_name,
+        'employee_count': entry['employee_count'] or entry['headcount_band'],
+        'is_sg': bool(entry['is_sg']),
+        'source': 'Directory',
+        'url': f"https://{website}" if website else '#',
+        'other_sources': []
+    }
+
+def consult_directory(company_name, refresh=False):
+    """Answer a lookup from fresh directory data, or seed its LinkedIn slug and website.
+
+    Only an exact name match with a fresh headcount (and refresh not set) is
+    returned as a result. Otherwise an exact match replaces the company's hints
+    with the directory's values, and a fuzzy match (often a related but different
+    entity) only fills hints that are missing. Returns None in those cases.
+
+    An entry seeds hints once; lookups may then replace or clear them, and the
+    directory only seeds again after the entry is re-imported with newer data.
+    """
+    try:
+        entry = directory_lookup(company_name)
+    except sqlite3.Error as e:
+        logger.warning('directory_error company=%r error=%s', company_name, e)
+        return None
+    if entry is None:
+        inc('scanner_directory_total', outcome='miss')
+        return None
+
+    exact = entry['match'] == 'exact'
+    fresh = time.time() - entry['updated_at'] < DIRECTORY_TTL
+    if exact and fresh and not refresh and (entry['employee_count'] or entry['headcount_band']):
+        inc('scanner_directory_total', outcome='hit')
+        return directory_result(company_name, entry)
+
+    if not exact:
+        logger.info('directory_fuzzy company=%r matched=%r similarity=%.2f',
+                    company_name, entry['name'], entry['similarity'])
+    key = normalize_company_name(company_name)
+    hints = get_hints(key)
+    if (hints.get('seeded_at') or 0) >= entry['updated_at']:
+        # A lookup may since have found these wrong, e.g. cleared a dead website
+        inc('scanner_directory_total', outcome='seeded')
+        return None
+    # The directory is authoritative over discovered values, a fuzzy guess is not
+    seed_hints(key, {
+        field: entry[field] for field in ('linkedin_slug', 'website')
+        if entry[field] and (exact or not hints.get(field))
+    })
+    inc('scanner_directory_total', outcome='seed' if exact else 'fuzzy_seed')
     return None
 
-def check_company_website(company_name, session):
-    """Try to find employee count on company website."""
+def read_directory_rows(path, file_format):
+    """Yield (line number, record) from a CSV or JSONL file one at a time.
+
+    The record is None for a JSONL line that is not a JSON object.
+    """
+    with open(path, encoding='utf-8-sig', errors='replace', newline='') as f:
+        if file_format == 'jsonl':
+            for number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    record = None
+                yield number, record if isinstance(record, dict) else None
+        else:
+            reader = csv.DictReader(f)
+            for record in reader:
+                yield reader.line_num, record
+
+def parse_directory_time(value, imported_at):
+    """Parse an updated_at value given as epoch seconds or an ISO date/datetime.
+
+    Missing values default to the import time. Unreadable ones return 0, so the
+    entry counts as stale rather than as freshly updated.
+    """
+    if not value:
+        return imported_at
     try:
-        # Try to find company website via Google
-        query = f"{company_name} singapore official website"
-        search_url = f"https://www.google.com/search?q={quote(query)}"
-        response = session.get(search_url, timeout=(5, 15))
-        
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Find first organic result (usually official website)
-            for cite in soup.select('.iUh30'):
-                if cite and not any(x in cite.text for x in ['linkedin', 'facebook', 'twitter', 'instagram']):
-                    company_url = cite.text
-                    print(f"Found company website: {company_url}")
-                    
-                    try:
-                        # Check common about/company pages
-                        paths = ['', '/about', '/about-us', '/company', '/about-company', '/careers']
-                        for path in paths:
-                            url = f"https://{company_url.strip('/')}{path}"
-                            print(f"Checking URL: {url}")
-                            
-                            response = session.get(url, timeout=(5, 15))
-                            if response.status_code == 200:
-                                soup = BeautifulSoup(response.text, 'html.parser')
-                                text = soup.get_text().lower()
-                                
-                                count = find_employee_count(text)
-                                if count:
-                                    is_sg = 'singapore' in text or ' sg ' in text
-                                    return {
-                                        'count': count,
-                                        'source': 'Company Website',
-                                        'url': url,
-                                        'is_sg': is_sg
-                                    }
-                    except Exception as e:
-                        print(f"Error checking company website: {str(e)}")
-                        continue
-                    
-                    break
-    except Exception as e:
-        print(f"Error finding company website: {str(e)}")
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return 0
+    # Dates without a timezone are taken as UTC
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+def directory_record(raw, imported_at):
+    """Map a raw CSV/JSONL record onto directory columns, or None if it has no name."""
+    raw = {str(column).strip().lower(): value for column, value in raw.items() if column}
+
+    def field(name):
+        for column in DIRECTORY_COLUMNS[name]:
+            value = raw.get(column)
+            if value not in (None, ''):
+                return str(value).strip()
+        return None
+
+    name = field('name')
+    key = normalize_company_name(name) if name else ''
+    if not key:
+        return None
+
+    website = field('website')
+    if website:
+        website = re.sub(r'^https?://', '', website).split('/')[0].lower() or None
+    linkedin_slug = field('linkedin_slug')
+    if linkedin_slug:
+        match = re.search(r'linkedin\.com/company/([^/?#]+)', linkedin_slug)
+        linkedin_slug = match.group(1) if match else linkedin_slug.strip('/')
+    count = field('employee_count')
+    try:
+        count = int(float(count.replace(',', ''))) if count else None
+    except ValueError:
+        count = None
+    is_sg = field('is_sg')
+    updated_at = parse_directory_time(field('updated_at'), imported_at)
+
+    return (key, name, field('uen'), website, linkedin_slug, count, field('headcount_band'),
+            int(is_sg.lower() not in ('0', 'false', 'no')) if is_sg else 1, updated_at)
+
+def import_directory_batch(records):
+    """Upsert a batch of directory records and their name tokens in one transaction."""
+    with db_lock:
+        conn = get_db()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany(
+                'INSERT OR REPLACE INTO directory (key, name, uen, website, linkedin_slug, employee_count, '
+                'headcount_band, is_sg, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                records
+            )
+            conn.executemany(
+                'INSERT OR IGNORE INTO directory_tokens (token, key) VALUES (?, ?)',
+                [(token, record[0]) for record in records for token in name_tokens(record[0])]
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+@app.cli.command('import-directory')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'file_format', type=click.Choice(['csv', 'jsonl']),
+              help='File format; guessed from the extension by default.')
+def import_directory(path, file_format):
+    """Import a company directory (e.g. an ACRA export) from a CSV or JSONL file."""
+    file_format = file_format or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+    imported_at = time.time()
+    imported = skipped = undated = 0
+    unreadable = []
+    batch = []
+    for line, raw in read_directory_rows(path, file_format):
+        if raw is None:
+            unreadable.append(line)
+            continue
+        record = directory_record(raw, imported_at)
+        if record is None:
+            skipped += 1
+            continue
+        if not record[-1]:
+            undated += 1
+        batch.append(record)
+        if len(batch) >= DIRECTORY_BATCH:
+            import_directory_batch(batch)
+            imported += len(batch)
+            batch = []
+            click.echo(f"Imported {imported} companies...")
+    if batch:
+        import_directory_batch(batch)
+        imported += len(batch)
+    click.echo(f"Imported {imported} companies, skipped {skipped} rows without a name")
+    if unreadable:
+        shown = ', '.join(str(line) for line in unreadable[:20])
+        more = f" and {len(unreadable) - 20} more" if len(unreadable) > 20 else ''
+        click.echo(f"Skipped {len(unreadable)} unreadable lines: {shown}{more}")
+    if undated:
+        click.echo(f"{undated} companies had an unreadable updated_at and were imported as stale")
+
+def discover_website(company_name, deadline=None):
+    """Find the company's official website domain via Google."""
+    query = f"{company_name} singapore official website"
+    search_url = f"https://www.google.com/search?q={quote(query)}"
+    response = fetch(search_url, deadline=deadline)
+    raise_if_inconclusive(response)
+
+    if response.status_code == 200:
+        soup = parse_google_results(response.text)
+
+        # Find first organic result (usually official website)
+        for cite in soup.select('.iUh30'):
+            if cite and not any(x in cite.text for x in ['linkedin', 'facebook', 'twitter', 'instagram']):
+                # Cites read like "www.example.com › about"; keep the domain
+                website = re.sub(r'^https?://', '', cite.text.split('›')[0].strip()).strip('/')
+                logger.debug('website_found company=%r website=%s', company_name, website)
+                return website or None
     return None
 
-def extract_from_linkedin(company_name, session):
-    """Try to find employee count on LinkedIn."""
+def check_company_website(company_name, deadline, checked=frozenset()):
+    """Try to find employee count on company website, skipping URLs already in checked."""
     try:
-        variations = [
-            company_name.lower(),
-            company_name.lower().replace(' ', '-'),
-            f"{company_name.lower()}-singapore",
-            company_name.lower().replace('pte', '').replace('ltd', '').strip()
-        ]
-        
-        for slug in variations:
+        key = normalize_company_name(company_name)
+        hinted = get_hints(key).get('website')
+        website = hinted or discover_website(company_name, deadline)
+        if not website:
+            return None
+
+        def check_path(path):
+            url = f"https://{website}{path}"
+            if url in checked:
+                return None
+            logger.debug('website_check url=%s', url)
+            try:
+                result = check_page(url, 'Company Website', deadline)
+            except Exception as e:
+                logger.warning('website_error url=%s error=%s', url, e)
+                raise LookupIncomplete(str(e)) from e
+            record_attempt('website_path', path or '/', result is not None)
+            return result
+
+        # Check common about/company pages, most productive first
+        paths = plan_strategies('website_path', [path or '/' for path in WEBSITE_PATHS])
+        result = race(
+            [lambda path=path: check_path(path.rstrip('/')) for path in paths],
+            deadline,
+            [rank * STRATEGY_STAGGER for rank in range(len(paths))]
+        )
+        if result and website != hinted:
+            # Only a site that produced a count is remembered, so one bad discovery can't stick
+            save_hint(key, 'website', website)
+        elif not result and hinted:
+            # race() only gets here when every path answered without a count, not
+            # when some were skipped or failed; rediscover next time
+            save_hint(key, 'website', None)
+        return result
+    except LookupIncomplete:
+        raise
+    except Exception as e:
+        logger.warning('website_discovery_error company=%r error=%s', company_name, e)
+        raise LookupIncomplete(str(e)) from e
+
+def extract_from_linkedin(company_name, deadline, checked=frozenset()):
+    """Try to find employee count on LinkedIn, skipping URLs already in checked."""
+    try:
+        key = normalize_company_name(company_name)
+
+        def check_slug(slug, variant=None):
             url = f"https://www.linkedin.com/company/{slug}"
-            print(f"Checking LinkedIn: {url}")
-            
+            if url in checked:
+                return None
+            logger.debug('linkedin_check url=%s', url)
             try:
-                response = session.get(url, timeout=(5, 15))
-                if response.status_code == 200:
-                    soup = BeautifulSoup(response.text, 'html.parser')
-                    text = soup.get_text().lower()
-                    
-                    count = find_employee_count(text)
-                    if count:
-                        is_sg = 'singapore' in text or ' sg ' in text
-                        return {
-                            'count': count,
-                            'source': 'LinkedIn',
-                            'url': url,
-                            'is_sg': is_sg
-                        }
+                result = check_page(url, 'LinkedIn', deadline)
             except Exception as e:
-                print(f"LinkedIn error for {slug}: {str(e)}")
-            
-            time.sleep(1)
+                logger.warning('linkedin_error slug=%s error=%s', slug, e)
+                raise LookupIncomplete(str(e)) from e
+            if variant:
+                record_attempt('linkedin_slug', variant, result is not None)
+            if result:
+                save_hint(key, 'linkedin_slug', slug)
+            return result
+
+        # A slug that worked before skips guessing entirely
+        hint = get_hints(key).get('linkedin_slug')
+        hint_checked = True
+        if hint:
+            try:
+                result = check_slug(hint)
+            except LookupIncomplete:
+                hint_checked = False
+            else:
+                if result:
+                    return result
+
+        variations = {}
+        for variant in plan_strategies('linkedin_slug', list(LINKEDIN_SLUGS)):
+            slug = LINKEDIN_SLUGS[variant](company_name)
+            if slug and slug != hint:
+                variations.setdefault(slug, variant)
+
+        result = race(
+            [lambda slug=slug, variant=variant: check_slug(slug, variant) for slug, variant in variations.items()],
+            deadline,
+            [rank * STRATEGY_STAGGER for rank in range(len(variations))]
+        )
+        if result is None and not hint_checked:
+            raise LookupIncomplete(f"LinkedIn slug {hint} could not be checked")
+        return result
+    except LookupIncomplete:
+        raise
     except Exception as e:
-        print(f"LinkedIn general error: {str(e)}")
-    return None
+        logger.warning('linkedin_error company=%r error=%s', company_name, e)
+        raise LookupIncomplete(str(e)) from e
 
-def extract_from_google(company_name, session):
+def extract_from_google(company_name, deadline, checked=frozenset()):
     """Try to find employee count via Google search."""
     try:
-        queries = [
-            f"{company_name} singapore number of employees",
-            f"{company_name} singapore company size",
-            f"{company_name} singapore total employees",
-            f"{company_name} singapore employee count linkedin",
-            f"{company_name} singapore how many employees",
-            f"{company_name} singapore workforce size"
-        ]
-        
-        for query in queries:
+        def check_query(template):
+            query = template.format(company_name)
+            result = None
             try:
                 url = f"https://www.google.com/search?q={quote(query)}"
-                print(f"Trying Google: {query}")
-                
-                response = session.get(url, timeout=(5, 15))
+                logger.debug('google_query query=%r', query)
+
+                response = fetch(url, deadline=deadline)
+                raise_if_inconclusive(response)
                 if response.status_code == 200:
-                    soup = BeautifulSoup(response.text, 'html.parser')
-                    
+                    soup = parse_google_results(response.text)
+
                     # Get text from search result snippets
                     snippets = []
                     for div in soup.select('.VwiC3b, .IsZvec, .MUxGbd'):
-                        if div.string:
-                            snippets.append(div.string.lower())
-                    
+                        snippets.append(div.get_text(' ').lower())
+
                     text = ' '.join(snippets)
-                    count = find_employee_count(text)
-                    
+                    with timed('scanner_extract_seconds'):
+                        count = find_employee_count(text)
+
                     if count:
                         is_sg = 'singapore' in text or ' sg ' in text
-                        return {
+                        result = {
                             'count': count,
                             'source': 'Google',
                             'url': url,
                             'is_sg': is_sg
                         }
             except Exception as e:
-                print(f"Google error for query '{query}': {str(e)}")
-            
-            time.sleep(1)
+                logger.warning('google_error query=%r error=%s', query, e)
+                raise LookupIncomplete(str(e)) from e
+            record_attempt('google_query', template, result is not None)
+            return result
+
+        templates = plan_strategies('google_query', GOOGLE_QUERIES)
+        return race(
+            [lambda template=template: check_query(template) for template in templates],
+            deadline,
+            [rank * STRATEGY_STAGGER for rank in range(len(templates))]
+        )
+    except LookupIncomplete:
+        raise
     except Exception as e:
-        print(f"Google general error: {str(e)}")
-    return None
+        logger.warning('google_error company=%r error=%s', company_name, e)
+        raise LookupIncomplete(str(e)) from e
 
-def extract_employee_count(company_name):
-    """Main function to extract employee count from multiple sources."""
-    print(f"\nSearching for employee count: {company_name}")
-    session = get_session()
-    
-    # Try LinkedIn first
-    result = extract_from_linkedin(company_name, session)
+# Sources in priority order: when several find a count, the earliest one wins.
+# plan_strategies() only decides which of them starts first.
+SOURCES = [
+    ('LinkedIn', extract_from_linkedin),
+    ('Company Website', check_company_website),
+    ('Google', extract_from_google)
+]
+
+def extract_employee_count(company_name, refresh=False, budget=None):
+    """Return the employee count for a company, served from the result cache when fresh.
+
+    Concurrent lookups of the same normalized name share one scrape: callers in
+    this worker wait on the in-flight lookup, and other workers wait on its lock.
+    """
+    if not refresh:
+        result = cache_get(company_name)
+        if result:
+            logger.debug('cache_hit company=%r', company_name)
+            inc('scanner_cache_total', outcome='hit')
+            return result
+    inc('scanner_cache_total', outcome='bypass' if refresh else 'miss')
+
+    result = consult_directory(company_name, refresh)
     if result:
-        print(f"Found on LinkedIn: {result}")
+        logger.debug('directory_hit company=%r', company_name)
         return result
-        
-    time.sleep(1)
-    
-    # Try company website
-    result = check_company_website(company_name, session)
-    if result:
-        print(f"Found on company website: {result}")
+
+    key = normalize_company_name(company_name)
+    with inflight_lock:
+        flight = inflight.get(key)
+        leader = flight is None
+        if leader:
+            flight = inflight[key] = {'done': threading.Event(), 'result': None, 'error': None}
+
+    if not leader:
+        logger.debug('inflight_join company=%r', company_name)
+        flight['done'].wait()
+        if flight['error'] is not None:
+            raise flight['error']
+        if flight['result'] is None:
+            # The leading lookup was cancelled before it finished, so run our own
+            return extract_employee_count(company_name, refresh, budget)
+        return dict(flight['result'], company=company_name)
+
+    try:
+        flight['result'] = lookup_with_lock(company_name, key, refresh, budget)
+        return flight['result']
+    except Exception as e:
+        flight['error'] = e
+        raise
+    finally:
+        with inflight_lock:
+            inflight.pop(key, None)
+        flight['done'].set()
+
+def lookup_with_lock(company_name, key, refresh, budget):
+    """Scrape a company while holding its cross-worker lock, or wait for the holder's result."""
+    started = time.time()
+    if budget is not None and not math.isfinite(budget):
+        budget = None
+    lease = (budget or LOOKUP_BUDGET) + LOOKUP_LOCK_GRACE
+    owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    while not acquire_lookup_lock(key, owner, lease):
+        # Another worker is scraping this company; its result lands in the cache
+        time.sleep(LOOKUP_LOCK_POLL)
+        result = cache_get(company_name, fetched_since=started if refresh else 0)
+        if result:
+            logger.debug('shared_lookup company=%r', company_name)
+            return result
+        if time.time() - started > lease:
+            # Any holder's lease has run out by now, so stop waiting and scrape
+            logger.warning('lookup_lock_timeout company=%r', company_name)
+            break
+
+    try:
+        result = scrape_employee_count(company_name, budget)
+        # A timed-out lookup is retried next time rather than cached as a miss
+        if result['employee_count'] != 'Timed out':
+            cache_put(company_name, result)
         return result
-        
-    time.sleep(1)
-    
-    # Try Google search
-    result = extract_from_google(company_name, session)
-    if result:
-        print(f"Found via Google: {result}")
+    finally:
+        release_lookup_lock(key, owner)
+
+def acquire_lookup_lock(key, owner, lease):
+    if not math.isfinite(lease):
+        raise ValueError(f"Invalid lookup lock lease: {lease}")
+    now = time.time()
+    try:
+        with db_lock:
+            conn = get_db()
+            conn.execute(
+                'DELETE FROM lookup_locks WHERE key = ? AND expires_at < ?', (key, now)
+            )
+            cursor = conn.execute(
+                'INSERT INTO lookup_locks (key, owner, expires_at) VALUES (?, ?, ?) '
+                'ON CONFLICT (key) DO NOTHING',
+                (key, owner, now + lease)
+            )
+            return cursor.rowcount == 1
+    except sqlite3.Error as e:
+        # Without the store, fall back to scraping rather than waiting forever
+        logger.warning('lookup_lock_error key=%r error=%s', key, e)
+        return True
+
+def release_lookup_lock(key, owner):
+    try:
+        with db_lock:
+            get_db().execute('DELETE FROM lookup_locks WHERE key = ? AND owner = ?', (key, owner))
+    except sqlite3.Error as e:
+        logger.warning('lookup_lock_error key=%r error=%s', key, e)
+
+def lookup_companies(companies, refresh=False, budget=None, timeout=None):
+    """Look up a batch, fetching each normalized name once.
+
+    Yields (company, result, error) for every row in completion order, with
+    duplicate rows sharing one lookup. With timeout set, None is yielded
+    whenever that many seconds pass without a completion.
+    """
+    rows = {}
+    for company in companies:
+        rows.setdefault(normalize_company_name(company), []).append(company)
+
+    def lookup(key):
+        with timed('scanner_lookup_seconds'):
+            return extract_employee_count(rows[key][0], refresh, budget)
+
+    lookups = run_concurrently(
+        lookup,
+        list(rows),
+        SEARCH_CONCURRENCY,
+        timeout=timeout
+    )
+    try:
+        for lookup in lookups:
+            if lookup is None:
+                yield None
+                continue
+            key, result, error = lookup
+            for company in rows[key]:
+                yield company, (dict(result, company=company) if result else result), error
+    finally:
+        # Cancels the remaining lookups when the caller stops early, e.g. a client disconnects
+        lookups.close()
+
+def run_source(source, extract, company_name, deadline, checked=frozenset()):
+    """Run one source for a company, recording its latency and outcome."""
+    start = time.perf_counter()
+    # Stays 'cancelled' if the race kills this source before it returns
+    outcome = 'cancelled'
+    try:
+        result = extract(company_name, deadline, checked)
+        outcome = 'hit' if result else 'miss'
+        record_attempt('source', source, bool(result))
+        return result
+    except LookupIncomplete:
+        outcome = 'incomplete'
+        raise
+    except Exception:
+        outcome = 'error'
+        raise
+    finally:
+        observe('scanner_source_seconds', time.perf_counter() - start, source=source)
+        inc('scanner_source_total', source=source, outcome=outcome)
+
+def found_result(company_name, result):
+    """Build the lookup result for a source's hit."""
+    logger.info('lookup_found company=%r source=%s count=%s', company_name, result['source'], result['count'])
+    return {
+        'company': company_name,
+        'employee_count': result['count'],
+        'is_sg': result['is_sg'],
+        'source': result['source'],
+        'url': result['url'],
+        'other_sources': []
+    }
+
+def check_hinted_pages(company_name, deadline, checked):
+    """Check the company's remembered LinkedIn page and website, one fetch each.
+
+    URLs that answered are added to checked, so the full race that follows a
+    miss doesn't fetch them again.
+    """
+    hints = get_hints(normalize_company_name(company_name))
+    pages = []
+    if hints.get('linkedin_slug'):
+        pages.append((f"https://www.linkedin.com/company/{hints['linkedin_slug']}", 'LinkedIn'))
+    if hints.get('website'):
+        path = plan_strategies('website_path', [path or '/' for path in WEBSITE_PATHS])[0].rstrip('/')
+        pages.append((f"https://{hints['website']}{path}", 'Company Website'))
+    if not pages:
+        return None
+
+    def check(url, source):
+        logger.debug('hinted_check url=%s', url)
+        result = check_page(url, source, deadline)
+        checked.add(url)
         return result
-    
-    print(f"No employee count found for {company_name}")
+
+    try:
+        return race([lambda url=url, source=source: check(url, source) for url, source in pages], deadline)
+    except LookupIncomplete as e:
+        logger.debug('hinted_check_incomplete company=%r error=%s', company_name, e)
+        return None
+
+def scrape_employee_count(company_name, budget=None):
+    """Return the highest-priority hit for the company.
+
+    Pages remembered for the company (from earlier lookups or the directory) are
+    checked first; only if they have no count is every source raced.
+    """
+    logger.debug('lookup_start company=%r', company_name)
+    deadline = time.time() + (budget or LOOKUP_BUDGET)
+    checked = set()
+    result = check_hinted_pages(company_name, deadline, checked)
+    if result:
+        inc('scanner_source_total', source=result['source'], outcome='hinted_hit')
+        return found_result(company_name, result)
+
+    # SOURCES order decides which hit wins; hit rates only decide which starts first
+    ranks = {source: rank for rank, source in enumerate(plan_strategies('source', [name for name, _ in SOURCES]))}
+    sources = [(source, extract) for source, extract in SOURCES if source in ranks]
+    try:
+        result = race(
+            [lambda source=source, extract=extract: run_source(source, extract, company_name, deadline, checked)
+             for source, extract in sources],
+            deadline,
+            [ranks[source] * STRATEGY_STAGGER for source, _ in sources]
+        )
+    except LookupIncomplete as e:
+        # Not every source could be checked, so this is no evidence the count is missing
+        logger.info('lookup_incomplete company=%r error=%s', company_name, e)
+        return {
+            'company': company_name,
+            'employee_count': 'Timed out',
+            'is_sg': False,
+            'source': 'None',
+            'url': '#',
+            'other_sources': []
+        }
+    if result:
+        return found_result(company_name, result)
+
+    logger.info('lookup_not_found company=%r', company_name)
     return {
         'company': company_name,
         'employee_count': 'Not found',
@@ -291,91 +1924,402 @@ def extract_employee_count(company_name):
         'other_sources': []
     }
 
+def create_job(companies, refresh=False, budget=None):
+    """Queue a batch of companies and return the new job id, dropping expired finished jobs."""
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    with db_lock:
+        conn = get_db()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            expired = "SELECT id FROM jobs WHERE status = 'done' AND updated_at < ?"
+            conn.execute(f'DELETE FROM job_items WHERE job_id IN ({expired})', (now - JOB_RETENTION,))
+            conn.execute(f'DELETE FROM jobs WHERE id IN ({expired})', (now - JOB_RETENTION,))
+            conn.execute(
+                'INSERT INTO jobs (id, status, refresh, budget, total, created_at, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (job_id, 'queued', int(refresh), budget or LOOKUP_BUDGET, len(companies), now, now)
+            )
+            conn.executemany(
+                'INSERT INTO job_items (job_id, position, company, key) VALUES (?, ?, ?, ?)',
+                [(job_id, position, company, normalize_company_name(company))
+                 for position, company in enumerate(companies)]
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+    return job_id
+
+def get_job(job_id):
+    """Return a job's status and the results finished so far, or None."""
+    with db_lock:
+        conn = get_db()
+        job = conn.execute(
+            'SELECT status, total, created_at, updated_at FROM jobs WHERE id = ?', (job_id,)
+        ).fetchone()
+        if not job:
+            return None
+        rows = conn.execute(
+            'SELECT company, result FROM job_items WHERE job_id = ? ORDER BY position', (job_id,)
+        ).fetchall()
+
+    results = []
+    for company, result in rows:
+        if result is None:
+            results.append({'company': company, 'employee_count': 'Pending', 'is_sg': False,
+                            'source': 'None', 'url': '#', 'other_sources': []})
+        else:
+            results.append(dict(json.loads(result), company=company))
+
+    status, total, created_at, updated_at = job
+    return {
+        'id': job_id,
+        'status': status,
+        'total': total,
+        'done': sum(1 for _, result in rows if result is not None),
+        'created_at': created_at,
+        'updated_at': updated_at,
+        'results': results
+    }
+
+def claim_job(owner):
+    """Lease the oldest unfinished job that no live worker holds."""
+    now = time.time()
+    with db_lock:
+        conn = get_db()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                "SELECT id, refresh, budget FROM jobs WHERE status != 'done' "
+                "AND (lease_until IS NULL OR lease_until < ?) ORDER BY created_at LIMIT 1",
+                (now,)
+            ).fetchone()
+            if row:
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', owner = ?, lease_until = ?, updated_at = ? WHERE id = ?",
+                    (owner, now + JOB_LEASE, now, row[0])
+                )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+    return row
+
+def renew_job_lease(job_id, owner):
+    """Extend the job's lease, returning False if another worker has taken it over."""
+    now = time.time()
+    with db_lock:
+        cursor = get_db().execute(
+            'UPDATE jobs SET lease_until = ?, updated_at = ? WHERE id = ? AND owner = ?',
+            (now + JOB_LEASE, now, job_id, owner)
+        )
+    return cursor.rowcount == 1
+
+def run_job(job_id, owner, refresh, budget):
+    """Look up every unfinished company in a job, checkpointing each result.
+
+    A lookup that raises leaves its rows pending for another pass, until it has
+    failed JOB_MAX_ATTEMPTS times and the error becomes its result. Stops early
+    if the lease is lost to another worker.
+    """
+    def lookup(item):
+        with timed('scanner_lookup_seconds'):
+            return extract_employee_count(item[1], refresh, budget)
+
+    while True:
+        # Rows sharing a normalized name are fetched once and all filled from that lookup
+        with db_lock:
+            pending = get_db().execute(
+                'SELECT key, MIN(company) FROM job_items WHERE job_id = ? AND result IS NULL GROUP BY key',
+                (job_id,)
+            ).fetchall()
+        if not pending:
+            break
+        logger.info('job_running job=%s pending=%d', job_id, len(pending))
+
+        lookups = run_concurrently(
+            lookup,
+            pending,
+            JOB_CONCURRENCY,
+            timeout=JOB_LEASE / 3
+        )
+        for outcome in lookups:
+            if outcome is not None:
+                (key, company), result, error = outcome
+                with db_lock:
+                    conn = get_db()
+                    if error is None:
+                        conn.execute(
+                            'UPDATE job_items SET result = ? WHERE job_id = ? AND key = ?',
+                            (json.dumps(result), job_id, key)
+                        )
+                    else:
+                        logger.warning('lookup_error company=%r error=%s', company, error)
+                        conn.execute(
+                            'UPDATE job_items SET attempts = attempts + 1, '
+                            'result = CASE WHEN attempts + 1 >= ? THEN ? END WHERE job_id = ? AND key = ?',
+                            (JOB_MAX_ATTEMPTS, json.dumps(error_result(company, error)), job_id, key)
+                        )
+            if not renew_job_lease(job_id, owner):
+                logger.warning('job_lease_lost job=%s', job_id)
+                lookups.close()
+                return
+
+    with db_lock:
+        cursor = get_db().execute(
+            "UPDATE jobs SET status = 'done', owner = NULL, lease_until = NULL, updated_at = ? "
+            "WHERE id = ? AND owner = ?",
+            (time.time(), job_id, owner)
+        )
+    if cursor.rowcount == 1:
+        logger.info('job_finished job=%s', job_id)
+    else:
+        logger.warning('job_lease_lost job=%s', job_id)
+
+def job_runner():
+    """Process queued jobs one at a time for the lifetime of this worker."""
+    owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    while True:
+        try:
+            job = claim_job(owner)
+            if job:
+                run_job(job[0], owner, bool(job[1]), job[2])
+                continue
+        except Exception as e:
+            logger.exception('job_runner_error error=%s', e)
+        time.sleep(JOB_POLL_INTERVAL)
+
+@app.before_request
+def ensure_job_runner():
+    """Start this worker's job runner, which also resumes jobs left by dead workers."""
+    with session_lock:
+        if job_runner_state['pid'] == os.getpid():
+            return
+        job_runner_state['pid'] = os.getpid()
+    spawn(job_runner)
+
+def metrics_flusher():
+    """Flush this worker's metrics on a timer, so /metrics stays current while it is idle."""
+    while True:
+        time.sleep(METRICS_FLUSH_INTERVAL)
+        try:
+            flush_metrics(force=True)
+        except Exception as e:
+            logger.warning('metrics_flush_error error=%s', e)
+
+@app.before_request
+def ensure_metrics_flusher():
+    if not METRICS_ENABLED:
+        return
+    with session_lock:
+        if metrics_flusher_state['pid'] == os.getpid():
+            return
+        metrics_flusher_state['pid'] = os.getpid()
+    spawn(metrics_flusher)
+
 @app.route('/game')
 def game():
     return render_template('game.html')
 
 @app.route('/leaderboard')
 def get_leaderboard():
-    scores = load_leaderboard()
-    # Sort by time, then moves
-    scores.sort(key=lambda x: (x['time'], x['moves']))
-    return jsonify(scores[:10])  # Return top 10 scores
+    # Sorted by time, then moves
+    return jsonify(top_scores())
 
 @app.route('/save-score', methods=['POST'])
 def save_score():
     score_data = request.json
-    scores = load_leaderboard()
-    scores.append({
-        'name': score_data['name'],
-        'time': score_data['time'],
-        'moves': score_data['moves']
-    })
-    # Sort and keep top 100 scores
-    scores.sort(key=lambda x: (x['time'], x['moves']))
-    scores = scores[:100]
-    save_leaderboard(scores)
+    add_score(score_data['name'], score_data['time'], score_data['moves'])
     return jsonify({'success': True})
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
+def parse_search_payload(data):
+    """Return (companies, refresh, budget) from a /search request body."""
+    # Handle both single company and list of companies
+    if 'company' in data:
+        companies = [data['company']]
+    else:
+        companies = data.get('companies', [])
+    refresh = bool(data.get('refresh', False))
+    try:
+        budget = float(data.get('budget') or LOOKUP_BUDGET)
+    except (TypeError, ValueError):
+        budget = math.nan
+    if not math.isfinite(budget):
+        raise ValueError('budget must be a number of seconds')
+    budget = min(max(budget, 1), MAX_LOOKUP_BUDGET)
+    return companies, refresh, budget
+
+def error_result(company, error):
+    return {
+        'company': company,
+        'employee_count': 'Error',
+        'is_sg': False,
+        'source': 'Error',
+        'url': '#',
+        'other_sources': [],
+        'error': str(error)
+    }
+
 @app.route('/search', methods=['POST'])
 def search():
     try:
         data = request.get_json()
-        print(f"Received search request with data: {data}")
-        
-        # Handle both single company and list of companies
-        if 'company' in data:
-            companies = [data['company']]
-        else:
-            companies = data.get('companies', [])
-        
+        logger.debug('search_request data=%s', data)
+        companies, refresh, budget = parse_search_payload(data)
+    except Exception as e:
+        logger.warning('search_error error=%s', e)
+        return jsonify({'error': str(e)}), 400
+
+    try:
         if not companies:
-            print("No companies provided in request")
+            logger.info('search_empty')
             return jsonify([])
         
-        print(f"Processing companies: {companies}")
+        logger.info('search_start companies=%d', len(companies))
+        inc('scanner_search_companies_total', len(companies), endpoint='search')
+        start = time.perf_counter()
         
         # Process companies concurrently
-        with ThreadPoolExecutor(max_workers=3) as executor:
-            future_to_company = {
-                executor.submit(extract_employee_count, company): company 
-                for company in companies
-            }
-            
-            results = []
-            for future in as_completed(future_to_company):
-                company = future_to_company[future]
-                try:
-                    result = future.result()
-                    print(f"Results for {company}: {result}")
-                    if result:
-                        results.append(result)
-                except Exception as e:
-                    print(f"Error processing company {company}: {str(e)}")
-                    results.append({
-                        'company': company,
-                        'employee_count': 'Error',
-                        'is_sg': False,
-                        'source': 'Error',
-                        'url': '#',
-                        'other_sources': [],
-                        'error': str(e)
-                    })
-                
-                # Add random delay to avoid rate limiting
-                time.sleep(random.uniform(0.5, 1.0))
-        
-        print(f"Final results: {results}")
+        results = []
+        for company, result, error in lookup_companies(companies, refresh, budget):
+            if error is None:
+                logger.debug('search_result company=%r result=%s', company, result)
+                if result:
+                    results.append(result)
+            else:
+                logger.warning('lookup_error company=%r error=%s', company, error)
+                results.append(error_result(company, error))
+
+        logger.info('search_done companies=%d', len(results))
+        observe('scanner_search_seconds', time.perf_counter() - start, endpoint='search')
         return jsonify(results)
         
     except Exception as e:
-        print(f"Search endpoint error: {str(e)}")
+        logger.exception('search_error error=%s', e)
         return jsonify({'error': str(e)}), 500
 
+@app.route('/search/stream', methods=['POST'])
+def search_stream():
+    """Stream one NDJSON event per finished company, with progress heartbeats."""
+    try:
+        data = request.get_json()
+        logger.debug('search_stream_request data=%s', data)
+        companies, refresh, budget = parse_search_payload(data)
+    except Exception as e:
+        logger.warning('search_stream_error error=%s', e)
+        return jsonify({'error': str(e)}), 400
+
+    def event(kind, **fields):
+        return json.dumps(dict(fields, type=kind)) + '\n'
+
+    def generate():
+        total = len(companies)
+        done = 0
+        start = time.perf_counter()
+        inc('scanner_search_companies_total', total, endpoint='stream')
+        yield event('start', total=total)
+
+        lookups = lookup_companies(companies, refresh, budget, timeout=STREAM_HEARTBEAT)
+        try:
+            for lookup in lookups:
+                if lookup is None:
+                    yield event('heartbeat', done=done, total=total)
+                    continue
+
+                company, result, error = lookup
+                done += 1
+                if error is not None:
+                    logger.warning('lookup_error company=%r error=%s', company, error)
+                    result = error_result(company, error)
+                if result:
+                    yield event('result', result=result, done=done, total=total)
+        finally:
+            # Runs when the client disconnects too, so its lookups stop
+            lookups.close()
+
+        observe('scanner_search_seconds', time.perf_counter() - start, endpoint='stream')
+        yield event('done', done=done, total=total)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/metrics')
+def metrics():
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+def read_job_companies():
+    """Return (companies, refresh, budget) from a JSON body or an uploaded CSV file."""
+    upload = request.files.get('file')
+    if upload is None:
+        return parse_search_payload(request.get_json())
+
+    reader = csv.reader(io.TextIOWrapper(upload.stream, encoding='utf-8-sig'))
+    rows = [row for row in reader if any(cell.strip() for cell in row)]
+    column = 0
+    if rows:
+        header = [cell.strip().lower() for cell in rows[0]]
+        for name in ('company', 'company name', 'name'):
+            if name in header:
+                column = header.index(name)
+                rows = rows[1:]
+                break
+    # Blank cells are skipped only in the company column; other columns may be empty
+    companies = [row[column].strip() for row in rows if len(row) > column and row[column].strip()]
+    refresh = request.form.get('refresh', '').lower() in ('1', 'true', 'yes', 'on')
+    return parse_search_payload({
+        'companies': companies,
+        'refresh': refresh,
+        'budget': request.form.get('budget')
+    })
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    try:
+        companies, refresh, budget = read_job_companies()
+    except Exception as e:
+        logger.warning('job_submit_error error=%s', e)
+        return jsonify({'error': str(e)}), 400
+
+    if not companies:
+        return jsonify({'error': 'No companies provided'}), 400
+    if len(companies) > MAX_JOB_COMPANIES:
+        return jsonify({'error': f'Maximum {MAX_JOB_COMPANIES} companies allowed per job'}), 400
+
+    job_id = create_job(companies, refresh, budget)
+    logger.info('job_queued job=%s companies=%d', job_id, len(companies))
+    return jsonify({'id': job_id, 'status': 'queued', 'total': len(companies)}), 202
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+@app.route('/jobs/<job_id>/results.csv')
+def job_results_csv(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=JOB_CSV_FIELDS, extrasaction='ignore')
+    writer.writeheader()
+    writer.writerows(job['results'])
+    return Response(
+        output.getvalue(),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename=job-{job_id}.csv'}
+    )
+
 if __name__ == '__main__':
     sys.setrecursionlimit(1000)  # Set a reasonable recursion limit
     port = int(os.environ.get('PORT', 5000))
@@ -0,0 +1,111 @@
+"""Offline speed and accuracy benchmark for the employee count extractor.
+
+Runs app.find_employee_count against the saved pages and snippets in
+benchmarks/fixtures and compares it with the original pattern-by-pattern loop.
+
+    python benchmarks/bench_extract.py [--rounds 200] [--min-accuracy 1.0]
+
+Exits non-zero if accuracy drops below --min-accuracy.
+"""
+import argparse
+import atexit
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+sys.path.insert(0, str(ROOT.parent))
+# Metrics are flushed to SCANNER_DB, which should not land in the repo
+SCRATCH = tempfile.mkdtemp()
+atexit.register(shutil.rmtree, SCRATCH, ignore_errors=True)
+os.environ.setdefault('SCANNER_DB', os.path.join(SCRATCH, 'scanner.db'))
+
+from app import find_employee_count, page_text  # noqa: E402
+
+LEGACY_PATTERNS = [
+    r'([\d,\.]+)[\+\s]*employees',
+    r'([\d,\.]+)[\+\s]*workers',
+    r'([\d,\.]+)[\+\s]*staff',
+    r'team of\s*([\d,\.]+)',
+    r'([\d,\.]+)\s*people',
+    r'([\d,\.]+)k\+?\s*employees',
+    r'employs\s*([\d,\.]+)',
+    r'workforce of\s*([\d,\.]+)',
+    r'company size[:\s]*([\d,\.]+)',
+    r'([\d,\.]+)\s*total employees',
+    r'([\d,\.]+)\s*professionals',
+    r'approximately\s*([\d,\.]+)\s*employees',
+    r'about\s*([\d,\.]+)\s*employees',
+    r'over\s*([\d,\.]+)\s*employees',
+    r'more than\s*([\d,\.]+)\s*employees',
+    r'([\d,\.]+)\s*employees worldwide',
+    r'global workforce of\s*([\d,\.]+)',
+    r'team size[:\s]*([\d,\.]+)',
+    r'number of employees[:\s]*([\d,\.]+)',
+    r'employee count[:\s]*([\d,\.]+)'
+]
+
+
+def legacy_find_employee_count(text):
+    """The extractor as it was before patterns were compiled into one regex."""
+    for pattern in LEGACY_PATTERNS:
+        match = re.search(pattern, text, re.IGNORECASE)
+        if match:
+            count_str = match.group(1).replace(',', '')
+            try:
+                if 'k' in count_str.lower():
+                    return int(float(count_str.lower().replace('k', '')) * 1000)
+                return int(float(count_str))
+            except ValueError:
+                continue
+    return None
+
+
+def load_corpus():
+    expected = json.loads((ROOT / 'fixtures' / 'expected.json').read_text())
+    corpus = []
+    for name, count in expected['pages'].items():
+        html = (ROOT / 'fixtures' / 'pages' / name).read_text(encoding='utf-8')
+        corpus.append((name, page_text(html), count))
+    for index, snippet in enumerate(expected['snippets']):
+        corpus.append((f'snippet {index}', snippet['text'], snippet['count']))
+    return corpus
+
+
+def run(extract, corpus, rounds):
+    misses = [(name, want, extract(text)) for name, text, want in corpus if extract(text) != want]
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for _, text, _ in corpus:
+            extract(text)
+    elapsed = time.perf_counter() - start
+    return len(corpus) * rounds / elapsed, 1 - len(misses) / len(corpus), misses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rounds', type=int, default=200)
+    parser.add_argument('--min-accuracy', type=float, default=1.0)
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    print(f"{len(corpus)} fixtures, {args.rounds} rounds")
+
+    accuracy = None
+    for label, extract in (('legacy', legacy_find_employee_count), ('compiled', find_employee_count)):
+        rate, accuracy, misses = run(extract, corpus, args.rounds)
+        print(f"{label:>9}: {rate:12,.0f} texts/sec  accuracy {accuracy:.0%}")
+        for name, want, got in misses:
+            print(f"{'':>11}{name}: expected {want}, got {got}")
+
+    if accuracy < args.min_accuracy:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""Micro-benchmark of HTML parsing on the saved fixture pages.
+
+Compares the original full html.parser parse plus get_text() with the
+lxml-based page_text() and the strained Google results parser, reporting
+time and peak memory per parse.
+
+    python benchmarks/bench_parse.py [--rounds 50] [--scale 20]
+
+--scale repeats each page body to approximate full-size pages.
+"""
+import argparse
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+ROOT = Path(__file__).resolve().parent
+sys.path.insert(0, str(ROOT.parent))
+# Metrics are flushed to SCANNER_DB, which should not land in the repo
+SCRATCH = tempfile.mkdtemp()
+atexit.register(shutil.rmtree, SCRATCH, ignore_errors=True)
+os.environ.setdefault('SCANNER_DB', os.path.join(SCRATCH, 'scanner.db'))
+
+from app import page_text, parse_google_results  # noqa: E402
+
+
+def legacy_parse(html):
+    return BeautifulSoup(html, 'html.parser').get_text().lower()
+
+
+def scaled(html, scale):
+    head, _, rest = html.partition('<body>')
+    body, _, tail = rest.partition('</body>')
+    return f"{head}<body>{body * scale}</body>{tail}"
+
+
+def measure(parse, html, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        parse(html)
+    elapsed = (time.perf_counter() - start) / rounds
+
+    tracemalloc.start()
+    parse(html)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rounds', type=int, default=50)
+    parser.add_argument('--scale', type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'page':<24}{'size':>9}{'legacy ms':>11}{'new ms':>9}{'legacy KiB':>12}{'new KiB':>9}")
+    for path in sorted((ROOT / 'fixtures' / 'pages').glob('*.html')):
+        html = scaled(path.read_text(encoding='utf-8'), args.scale)
+        parse = parse_google_results if path.name.startswith('google') else page_text
+        old_time, old_peak = measure(legacy_parse, html, args.rounds)
+        new_time, new_peak = measure(parse, html, args.rounds)
+        print(f"{path.name:<24}{len(html):>9,}{old_time * 1000:>11.2f}{new_time * 1000:>9.2f}"
+              f"{old_peak / 1024:>12,.0f}{new_peak / 1024:>9,.0f}")
+
+
+if __name__ == '__main__':
+    main()
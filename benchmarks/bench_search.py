@@ -0,0 +1,92 @@
+"""Load benchmark for POST /search, meant to run against a replay server.
+
+Sends one single-company /search request per company name (with the cache
+bypassed) at each requested concurrency level. Reports throughput, p50/p99
+per-company latency, and the CPU time used by the app's workers, taken from
+process_cpu_seconds_total on /metrics. Workers flush that every few seconds, so
+each level waits --settle seconds before reading it again.
+
+    python benchmarks/bench_search.py --app http://127.0.0.1:10000 \\
+        --companies companies.txt --count 200 --concurrency 1,8,32
+"""
+import argparse
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle, islice
+
+import requests
+
+DEFAULT_COMPANIES = [
+    'DBS Bank', 'OCBC Bank', 'UOB', 'Singtel', 'Grab', 'Sea Ltd', 'CapitaLand',
+    'Keppel Corporation', 'Sembcorp Industries', 'Wilmar International',
+    'Singapore Airlines', 'ST Engineering', 'City Developments', 'Jardine Cycle & Carriage',
+    'Genting Singapore', 'SATS', 'ComfortDelGro', 'Venture Corporation', 'Olam Group', 'Razer'
+]
+
+
+def cpu_seconds(app_url):
+    """Return the workers' combined CPU time from /metrics, or None if unavailable."""
+    try:
+        text = requests.get(f'{app_url}/metrics', timeout=10).text
+    except requests.RequestException:
+        return None
+    match = re.search(r'^process_cpu_seconds_total (\S+)$', text, re.MULTILINE)
+    return float(match.group(1)) if match else None
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def lookup(app_url, company, budget):
+    start = time.perf_counter()
+    response = requests.post(
+        f'{app_url}/search',
+        json={'company': company, 'refresh': True, 'budget': budget},
+        timeout=budget + 30
+    )
+    elapsed = time.perf_counter() - start
+    results = response.json() if response.ok else []
+    found = bool(results) and results[0].get('employee_count') not in ('Not found', 'Error')
+    return elapsed, response.ok, found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--app', default='http://127.0.0.1:10000', help='base URL of the running app')
+    parser.add_argument('--companies', help='file with one company name per line')
+    parser.add_argument('--count', type=int, default=100, help='requests per concurrency level')
+    parser.add_argument('--concurrency', default='1,4,16', help='comma-separated concurrency levels')
+    parser.add_argument('--budget', type=float, default=30, help='per-company lookup budget in seconds')
+    parser.add_argument('--settle', type=float, default=6,
+                        help='seconds to wait for every worker to flush its metrics (METRICS_FLUSH_INTERVAL is 5)')
+    args = parser.parse_args()
+
+    companies = DEFAULT_COMPANIES
+    if args.companies:
+        with open(args.companies, encoding='utf-8') as f:
+            companies = [line.strip() for line in f if line.strip()]
+    names = list(islice(cycle(companies), args.count))
+
+    print(f"{'conc':>5}{'req/s':>9}{'p50 s':>9}{'p99 s':>9}{'found':>8}{'errors':>8}{'cpu s':>9}")
+    for concurrency in [int(level) for level in args.concurrency.split(',')]:
+        cpu_before = cpu_seconds(args.app)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            outcomes = list(executor.map(lambda name: lookup(args.app, name, args.budget), names))
+        wall = time.perf_counter() - start
+        time.sleep(args.settle)
+        cpu_after = cpu_seconds(args.app)
+
+        latencies = [elapsed for elapsed, _, _ in outcomes]
+        errors = sum(1 for _, ok, _ in outcomes if not ok)
+        found = sum(1 for _, _, hit in outcomes if hit)
+        cpu = f'{cpu_after - cpu_before:.2f}' if cpu_before is not None and cpu_after is not None else 'n/a'
+        print(f"{concurrency:>5}{len(names) / wall:>9.2f}{percentile(latencies, 0.5):>9.2f}"
+              f"{percentile(latencies, 0.99):>9.2f}{found:>8}{errors:>8}{cpu:>9}")
+
+
+if __name__ == '__main__':
+    main()
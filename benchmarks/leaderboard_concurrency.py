@@ -0,0 +1,80 @@
+"""Check that parallel /save-score submissions from several processes lose no scores.
+
+Each process plays the part of a gunicorn worker: it imports the app against a
+fresh leaderboard database and submits its share of scores, with threads inside
+each process. Afterwards every submitted score must be on the board, and the
+board must never exceed the top-100 trim.
+
+    python benchmarks/leaderboard_concurrency.py [--workers 4] [--threads 8] [--scores 20]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import Process
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+
+
+def submit(worker, threads, scores):
+    import app
+
+    client = app.app.test_client()
+
+    def post(index):
+        response = client.post('/save-score', json={
+            'name': f'w{worker}-{index}', 'time': worker * 1000 + index, 'moves': index
+        })
+        assert response.status_code == 200, response.status_code
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(post, range(scores)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--scores', type=int, default=20, help='scores submitted per worker')
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(ROOT.parent))
+    # The app's background job runner keeps scanner.db open, so clean up leniently
+    directory = tempfile.mkdtemp()
+    try:
+        os.environ['LEADERBOARD_DB'] = os.path.join(directory, 'leaderboard.db')
+        os.environ['SCANNER_DB'] = os.path.join(directory, 'scanner.db')
+        import app
+
+        # Start from an empty board rather than the seeded leaderboard.json
+        app.get_leaderboard_db().execute('DELETE FROM scores')
+
+        processes = [Process(target=submit, args=(worker, args.threads, args.scores))
+                     for worker in range(args.workers)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        if any(process.exitcode for process in processes):
+            sys.exit('A worker failed while submitting scores')
+
+        names = {name for (name,) in app.get_leaderboard_db().execute('SELECT name FROM scores')}
+        submitted = args.workers * args.scores
+        expected = min(submitted, app.LEADERBOARD_SIZE)
+        top = app.app.test_client().get('/leaderboard').json
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    print(f"submitted {submitted}, stored {len(names)}, expected {expected}")
+    print(f"top score: {top[0]}")
+    if len(names) != expected:
+        sys.exit('Scores were lost')
+    if top[0] != {'name': 'w0-0', 'time': 0, 'moves': 0}:
+        sys.exit('Leaderboard order is wrong')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""Local stand-in for Google, LinkedIn and company sites, replaying recorded responses.
+
+Record a cassette by running the app with CASSETTE_DB set, e.g.
+
+    CASSETTE_DB=cassettes.db python app.py
+
+then serve it and point the app at the server instead of the real sites:
+
+    python benchmarks/replay_server.py cassettes.db --latency 0.3 --rate-429 0.05
+    REPLAY_URL=http://127.0.0.1:8800 gunicorn -c gunicorn.conf.py app:app
+
+The app requests /replay?url=<original url>. Recorded URLs are replayed with
+their original status, content type and body; unrecorded ones get a 404.
+"""
+import argparse
+import hashlib
+import random
+import sqlite3
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        url = parse_qs(urlparse(self.path).query).get('url', [''])[0]
+        options = self.server.options
+
+        # Injected latency: the mean plus or minus up to the jitter
+        delay = options.latency + random.uniform(-options.jitter, options.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+        roll = random.random()
+        if roll < options.rate_429:
+            return self.reply(429, 'text/html', b'Too Many Requests', {'Retry-After': '1'})
+        if roll < options.rate_429 + options.error_rate:
+            return self.reply(503, 'text/html', b'Service Unavailable')
+
+        response = self.server.lookup(url)
+        if response is None:
+            return self.reply(404, 'text/html', b'Not recorded')
+
+        status, content_type, body = response
+        body = body.encode('utf-8')
+        etag = '"%s"' % hashlib.sha1(body).hexdigest()
+        if status == 200 and self.headers.get('If-None-Match') == etag:
+            return self.reply(304, content_type, b'', {'ETag': etag})
+        self.reply(status, content_type, body, {'ETag': etag} if status == 200 else None)
+
+    def reply(self, status, content_type, body, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type or 'text/html')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+
+class ReplayServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, cassette, options):
+        super().__init__(address, ReplayHandler)
+        self.cassette = cassette
+        self.options = options
+        self.verbose = options.verbose
+        self.local = threading.local()
+
+    def lookup(self, url):
+        if not hasattr(self.local, 'conn'):
+            self.local.conn = sqlite3.connect(f'file:{self.cassette}?mode=ro', uri=True)
+        return self.local.conn.execute(
+            'SELECT status, content_type, body FROM responses WHERE url = ?', (url,)
+        ).fetchone()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('cassette', help='cassette database recorded with CASSETTE_DB')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8800)
+    parser.add_argument('--latency', type=float, default=0.2, help='mean response delay in seconds')
+    parser.add_argument('--jitter', type=float, default=0.1, help='maximum deviation from the mean delay')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests answered with 503')
+    parser.add_argument('--rate-429', type=float, default=0.0, help='fraction of requests answered with 429')
+    parser.add_argument('--verbose', action='store_true')
+    options = parser.parse_args()
+
+    server = ReplayServer((options.host, options.port), options.cassette, options)
+    print(f"Replaying {options.cassette} on http://{options.host}:{options.port}")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -43,6 +43,72 @@ function createOtherSourcesTooltip(sources) {
     }).join('\n');
 }
 
+function renderResult(result) {
+    const row = document.createElement('tr');
+    
+    // Company name
+    const nameCell = document.createElement('td');
+    nameCell.textContent = result.company;
+    row.appendChild(nameCell);
+    
+    // Employee count
+    const countCell = document.createElement('td');
+    countCell.textContent = formatNumber(result.employee_count);
+    row.appendChild(countCell);
+    
+    // Region
+    const regionCell = document.createElement('td');
+    const badge = document.createElement('span');
+    badge.className = `badge ${result.is_sg ? 'sg-badge' : 'global-badge'}`;
+    badge.textContent = result.is_sg ? 'Singapore' : 'Global';
+    regionCell.appendChild(badge);
+    row.appendChild(regionCell);
+    
+    // Main source
+    const sourceCell = document.createElement('td');
+    const sourceLink = document.createElement('a');
+    sourceLink.href = result.url;
+    sourceLink.target = '_blank';
+    sourceLink.appendChild(createSourceBadge(result.source, true));
+    sourceCell.appendChild(sourceLink);
+    row.appendChild(sourceCell);
+    
+    // Other sources
+    const otherSourcesCell = document.createElement('td');
+    if (result.other_sources && result.other_sources.length > 0) {
+        const sourcesContainer = document.createElement('div');
+        sourcesContainer.className = 'other-sources';
+        
+        result.other_sources.forEach(source => {
+            const sourceBadge = createSourceBadge(source.source);
+            sourceBadge.title = `${formatNumber(source.count)} ${source.is_sg ? '(SG)' : '(Global)'}`;
+            sourcesContainer.appendChild(sourceBadge);
+        });
+        
+        otherSourcesCell.appendChild(sourcesContainer);
+    } else {
+        otherSourcesCell.textContent = 'None';
+    }
+    row.appendChild(otherSourcesCell);
+    
+    document.getElementById('resultsBody').appendChild(row);
+}
+
+function updateProgress(done, total) {
+    document.querySelector('#loading .loading-text').textContent =
+        `Searched ${done} of ${total} companies across multiple sources...`;
+}
+
+function handleSearchEvent(event) {
+    if (event.type === 'start' || event.type === 'heartbeat') {
+        updateProgress(event.done || 0, event.total);
+    } else if (event.type === 'result') {
+        renderResult(event.result);
+        document.getElementById('results').style.display = 'block';
+        updateProgress(event.done, event.total);
+    }
+}
+
 function searchCompanies() {
     const companies = textarea.value.trim().split('\n').filter(company => company.trim());
     
@@ -62,75 +128,43 @@ function searchCompanies() {
     document.getElementById('noResults').style.display = 'none';
     document.getElementById('searchButton').disabled = true;
 
-    fetch('/search', {
+    const resultsBody = document.getElementById('resultsBody');
+    resultsBody.innerHTML = '';
+    updateProgress(0, companies.length);
+
+    // Results arrive as newline-delimited JSON events, one per finished company
+    fetch('/search/stream', {
         method: 'POST',
         headers: {
             'Content-Type': 'application/json',
         },
         body: JSON.stringify({ companies }),
     })
-    .then(response => response.json())
-    .then(data => {
-        if (data.length === 0) {
-            document.getElementById('noResults').style.display = 'block';
-            return;
+    .then(async response => {
+        if (!response.ok) {
+            throw new Error(`Search failed with status ${response.status}`);
         }
 
-        const resultsBody = document.getElementById('resultsBody');
-        resultsBody.innerHTML = '';
-
-        data.forEach(result => {
-            const row = document.createElement('tr');
-            
-            // Company name
-            const nameCell = document.createElement('td');
-            nameCell.textContent = result.company;
-            row.appendChild(nameCell);
-            
-            // Employee count
-            const countCell = document.createElement('td');
-            countCell.textContent = formatNumber(result.employee_count);
-            row.appendChild(countCell);
-            
-            // Region
-            const regionCell = document.createElement('td');
-            const badge = document.createElement('span');
-            badge.className = `badge ${result.is_sg ? 'sg-badge' : 'global-badge'}`;
-            badge.textContent = result.is_sg ? 'Singapore' : 'Global';
-            regionCell.appendChild(badge);
-            row.appendChild(regionCell);
-            
-            // Main source
-            const sourceCell = document.createElement('td');
-            const sourceLink = document.createElement('a');
-            sourceLink.href = result.url;
-            sourceLink.target = '_blank';
-            sourceLink.appendChild(createSourceBadge(result.source, true));
-            sourceCell.appendChild(sourceLink);
-            row.appendChild(sourceCell);
-            
-            // Other sources
-            const otherSourcesCell = document.createElement('td');
-            if (result.other_sources && result.other_sources.length > 0) {
-                const sourcesContainer = document.createElement('div');
-                sourcesContainer.className = 'other-sources';
-                
-                result.other_sources.forEach(source => {
-                    const sourceBadge = createSourceBadge(source.source);
-                    sourceBadge.title = `${formatNumber(source.count)} ${source.is_sg ? '(SG)' : '(Global)'}`;
-                    sourcesContainer.appendChild(sourceBadge);
-                });
-                
-                otherSourcesCell.appendChild(sourcesContainer);
-            } else {
-                otherSourcesCell.textContent = 'None';
-            }
-            row.appendChild(otherSourcesCell);
-            
-            resultsBody.appendChild(row);
-        });
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
 
-        document.getElementById('results').style.display = 'block';
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+
+            buffer += decoder.decode(value, { stream: true });
+            const lines = buffer.split('\n');
+            buffer = lines.pop();
+            lines.filter(line => line.trim()).forEach(line => handleSearchEvent(JSON.parse(line)));
+        }
+        if (buffer.trim()) {
+            handleSearchEvent(JSON.parse(buffer));
+        }
+
+        if (resultsBody.children.length === 0) {
+            document.getElementById('noResults').style.display = 'block';
+        }
     })
     .catch(error => {
         console.error('Error:', error);